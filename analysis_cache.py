@@ -0,0 +1,207 @@
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from csv_pipeline import convert_results, export_frame
+from result_viewer import ResultIndex
+
+# Memória ocupada pelas análises guardadas (tabelas, frequências, imagens e downloads em bytes)
+MAX_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Espaço em disco ocupado pelos arquivos das análises guardadas (índices e arquivos de resultado)
+MAX_CACHE_DISK_BYTES = 10 * 1024 * 1024 * 1024
+
+# Quantidade máxima de análises guardadas, independentemente do tamanho
+MAX_CACHE_ENTRIES = 16
+
+
+# Hash do conteúdo de um arquivo (caminho ou objeto como o UploadedFile do Streamlit)
+def file_digest(source):
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    position = source.tell()
+    source.seek(0)
+    for block in iter(lambda: source.read(1 << 20), b''):
+        digest.update(block)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+# Arquivos temporários de uma análise: o índice paginado e os arquivos de resultado
+class _TemporaryFiles:
+
+    def __init__(self):
+        self.index = None
+        self.paths = []
+
+    def size_bytes(self):
+        size = self.index.size_bytes() if self.index is not None else 0
+        for path in self.paths:
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def cleanup(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        for path in self.paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self.paths = []
+
+
+# Tudo o que a tela da análise em massa precisa para ser exibida de novo sem recalcular:
+# contagens, frequências, palavras do Sankey, imagens das nuvens de palavras e os arquivos
+# para download. table é o DataFrame completo (análise em memória) ou None (análise em blocos,
+# cujo resultado completo fica em output_path).
+class AnalysisResult:
+
+    def __init__(self, rows, sentiment_counts, word_frequencies, table, output_path=None, output_format=None,
+                 cache_stats=None, seconds=0.0):
+        self.rows = rows
+        self.sentiment_counts = dict(sentiment_counts)
+        self.word_frequencies = word_frequencies
+        self.table = table
+        self.output_path = output_path
+        self.output_format = output_format
+        self.cache_stats = cache_stats
+        self.seconds = seconds
+        self.sankey_words = {}
+        self.wordclouds = {}
+        # Downloads já gerados: bytes (análise em memória) ou arquivos convertidos (análise em blocos)
+        self._exports = {}
+        self._export_paths = {}
+        self._lock = threading.Lock()
+        # Os arquivos só são apagados quando nenhuma sessão usa mais a análise (ou em close()):
+        # sair do cache não basta, porque outra sessão pode estar exibindo a mesma análise
+        self._files = _TemporaryFiles()
+        if output_path:
+            self._files.paths.append(output_path)
+        self._finalizer = weakref.finalize(self, self._files.cleanup)
+        self._table_bytes = int(table.memory_usage(deep=True).sum()) if table is not None else 0
+        self._words_bytes = sum(len(counts) for counts in word_frequencies.values()) * 100
+
+    @property
+    def streamed(self):
+        return self.output_path is not None
+
+    # Conteúdo do download no formato pedido, em bytes. Na análise em blocos o arquivo é lido do
+    # disco a cada pedido e fechado em seguida; na análise em memória os bytes ficam guardados.
+    def export(self, output_format):
+        with self._lock:
+            if not self.streamed:
+                if output_format not in self._exports:
+                    self._exports[output_format] = export_frame(self.table, output_format).getvalue()
+                return self._exports[output_format]
+            path = self.output_path
+            if output_format != self.output_format:
+                if output_format not in self._export_paths:
+                    self._export_paths[output_format] = convert_results(self.output_path, output_format)
+                    self._files.paths.append(self._export_paths[output_format])
+                path = self._export_paths[output_format]
+        with open(path, 'rb') as file:
+            return file.read()
+
+    # Índice paginado da tabela de resultados, montado na primeira exibição
+    def viewer(self):
+        with self._lock:
+            if self._files.index is None:
+                if self.streamed:
+                    self._files.index = ResultIndex.from_results(self.output_path)
+                else:
+                    self._files.index = ResultIndex.from_frame(self.table)
+            return self._files.index
+
+    def memory_bytes(self):
+        size = self._table_bytes + self._words_bytes
+        size += sum(image.nbytes for image in self.wordclouds.values())
+        size += sum(len(data) for data in self._exports.values())
+        return size
+
+    def disk_bytes(self):
+        return self._files.size_bytes()
+
+    # Remove os arquivos temporários agora, mesmo que a análise ainda esteja em uso
+    def close(self):
+        self._finalizer()
+
+
+# Análises guardadas por (hash do arquivo, versão do modelo, modo), descartando as usadas há
+# mais tempo quando a memória passa de max_bytes, o disco de max_disk_bytes ou a quantidade de
+# max_entries. A mais recente nunca é descartada.
+class AnalysisCache:
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES,
+                 max_disk_bytes=MAX_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(digest, model_version, streamed):
+        return (digest, model_version, bool(streamed))
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = result
+        self.trim()
+
+    # Descarta análises antigas até caber nos limites (chamado também depois de gerar um download).
+    # As descartadas não são fechadas aqui: os arquivos somem quando a última sessão as solta.
+    def trim(self):
+        with self._lock:
+            memory = sum(result.memory_bytes() for result in self._entries.values())
+            disk = sum(result.disk_bytes() for result in self._entries.values())
+            while len(self._entries) > 1 and (memory > self.max_bytes or disk > self.max_disk_bytes
+                                              or len(self._entries) > self.max_entries):
+                _, result = self._entries.popitem(last=False)
+                memory -= result.memory_bytes()
+                disk -= result.disk_bytes()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'memory_bytes': sum(result.memory_bytes() for result in self._entries.values()),
+                'disk_bytes': sum(result.disk_bytes() for result in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Cache único por processo: uma análise feita em uma sessão é reaproveitada pelas demais
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = AnalysisCache()
+    return _analysis_cache
@@ -1,62 +1,30 @@
 import streamlit as st
-import joblib
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.graph_objs import Sankey
 from collections import Counter
 from wordcloud import WordCloud
+import math
 import time
 
-# Autenticação do GSheets
-import os
-import requests
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-
-# Configurando autenticação do Google Sheets
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-creds = None
-
-# URL do arquivo token.json no GitHub
-GITHUB_CREDENTIALS_URL = "https://github.com/dreymond1/streamlitapp/blob/main/token.json"
-
-# Faz o download do arquivo token.json do GitHub
-def download_credentials_from_github(url, filename="token.json"):
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(filename, "wb") as file:
-            file.write(response.content)
-    else:
-        raise Exception(f"Erro ao baixar o arquivo: {response.status_code}")
-
-# Baixar o credentials.json se não existir
-if not os.path.exists('token.json'):
-    download_credentials_from_github(GITHUB_CREDENTIALS_URL)
-
-# Processo de autenticação
-if os.path.exists('token.json'):
-    creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-
-if not creds or not creds.valid:
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-        creds = flow.run_local_server(port=0)
-    with open('token.json', 'w') as token:
-        token.write(creds.to_json())
-
-# Configurando o serviço do Google Sheets
-service = build('sheets', 'v4', credentials=creds)
-sheet = service.spreadsheets()
-
-# Carregar o modelo Naive Bayes
-model = joblib.load('modelo_naive_bayes.pkl')
-
-# Carregar o vetorizador
-vectorizer = joblib.load('vectorizer.pkl')
+from instrumentation import get_stage_metrics, log_stages, stage
+from model_registry import get_registry
+from prediction_cache import get_prediction_cache, predict_cached
+from word_frequencies import SENTIMENTS, count_words, sankey_top_words, wordcloud_frequencies
+from analysis_cache import AnalysisCache, AnalysisResult, file_digest, get_analysis_cache
+from feedback import get_feedback_learner
+from result_viewer import PAGE_SIZE, SEARCH_MIN_CHARS
+from csv_pipeline import OUTPUT_FORMATS, PYARROW_AVAILABLE, analyze_csv_stream, predict_comments, read_table
+from parallel_inference import DEFAULT_WORKERS
+from sheets_scheduler import MAX_WORKERS, SheetsSyncScheduler, get_rate_limiter, get_service_pool, parse_targets
+from sheets_sync import process_comments_and_sentiments
+
+# O streamlit run não configura o logger raiz: sem isto os logs JSON das etapas seriam descartados
+log_stages()
+
+# Carregar o modelo Naive Bayes e o vetorizador (compartilhados entre sessões e recarregados
+# automaticamente quando os arquivos .pkl mudam em disco)
+modelo_atual = get_registry().get()
 
 #  Título da página
 st.set_page_config(page_title="Análise de Sentimento", page_icon="🔍", layout="centered")
@@ -77,6 +45,12 @@ with st.sidebar:
     
     coluna_sentimento_input = st.text_input("Nome da Coluna de Sentimento:", placeholder="Exemplo: B")
 
+    incremental_input = st.checkbox("Processar apenas as linhas novas (incremental)", value=False,
+                                    help="Para planilhas que só recebem linhas no final. "
+                                         "Continua a partir da última linha já processada.")
+    recomecar_input = st.checkbox("Recomeçar do início", value=False,
+                                  help="Ignora o ponto em que uma execução interrompida parou.")
+
     if id_input == "" or aba_input == "" or coluna_comentario_input == "" or coluna_sentimento_input == "":
         st.error("Preencha todos os campos antes de analisar!")
     else:
@@ -87,42 +61,52 @@ with st.sidebar:
             COMMENT_COLUMN = coluna_comentario_input
             SENTIMENT_COLUMN = coluna_sentimento_input
             
-            # Função para prever sentimento
-            def analyze_sentiment(comment):
-                sentimento_vec = vectorizer.transform([comment])  # Passar como lista
-                sentimento_pred = model.predict(sentimento_vec)
-                return str(sentimento_pred[0]) 
-            
-            # Função que recebe os valores da planilha e modificada
-            def process_comments_and_sentiments():
-            
-                # Obtendo os dados da planilha
-                range_to_read = f"{SHEET_NAME}!{COMMENT_COLUMN}:{SENTIMENT_COLUMN}"
-                result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=range_to_read).execute()
-                rows = result.get('values', [])
-            
-                # Preparar os dados para escrita (incluindo cabeçalhos)
-                updates = []
-                for i, row in enumerate(rows):
-                    if i == 0:
-                        continue  # Ignorar cabeçalhos, se houver
-                    comment = row[0] if len(row) > 0 else ""  # Verificar se há comentário
-                    sentiment = row[1] if len(row) > 1 else ""  # Verificar se há sentimento
-            
-                    if comment and not sentiment:  # Só processa se houver comentário sem sentimento
-                        predicted_sentiment = analyze_sentiment(comment)
-                        updates.append({'range': f"{SHEET_NAME}!{SENTIMENT_COLUMN}{i+1}",
-                                        'values': [[predicted_sentiment]]})
-            
-                # Atualizar a planilha com os sentimentos
-                if updates:
-                    body = {'valueInputOption': 'RAW', 'data': updates}
-                    service.spreadsheets().values().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body).execute()
-            
-                print(f"Processamento concluído!")
-            
-            # Executar
-            process_comments_and_sentiments()
+            # Barra de progresso com as linhas já lidas da planilha
+            progress_bar = st.progress(0)
+
+            def update_progress(rows_read, row_count, updated):
+                progress_bar.progress(min(rows_read / max(row_count, 1), 1.0),
+                                      text=f"{rows_read}/{row_count} linhas lidas, {updated} sentimentos previstos")
+
+            # Conexão emprestada do pool do processo (as credenciais e o serviço são criados só no primeiro uso).
+            # Executar (leitura, previsão e escrita em blocos), dividindo a cota da API com as demais sessões
+            with get_service_pool().connection() as service:
+                updated = process_comments_and_sentiments(get_rate_limiter().wrap(service), SPREADSHEET_ID,
+                                                          SHEET_NAME, COMMENT_COLUMN, SENTIMENT_COLUMN,
+                                                          progress=update_progress, incremental=incremental_input,
+                                                          restart=recomecar_input)
+            st.success(f"Processamento concluído! {updated} linhas atualizadas.")
+
+    # Várias planilhas processadas em paralelo, respeitando as cotas da API
+    with st.expander("Analisar várias planilhas de uma vez"):
+        alvos_input = st.text_area("Uma planilha por linha (ID;Aba;Coluna de Comentário;Coluna de Sentimento):",
+                                   placeholder="1YYvqp_w9zDIgjNHFC8mh7Rkku6gKRN7Rwo8ydHKCqVA;Aba-teste;A;B")
+        planilhas_simultaneas = st.slider("Planilhas ao mesmo tempo:", min_value=1, max_value=8, value=MAX_WORKERS)
+        if st.button("Analisar todas as planilhas"):
+            try:
+                alvos = parse_targets(alvos_input)
+            except ValueError as erro:
+                alvos = []
+                st.error(str(erro))
+            if alvos:
+                tabela_status = st.empty()
+                agendador = SheetsSyncScheduler(max_workers=planilhas_simultaneas, incremental=incremental_input,
+                                                restart=recomecar_input)
+                relatorio = agendador.run(alvos, on_update=lambda parcial: tabela_status.dataframe(pd.DataFrame(parcial)))
+                tabela_status.dataframe(pd.DataFrame(relatorio))
+                erros = sum(item['estado'] == 'erro' for item in relatorio)
+                if erros:
+                    st.warning(f"{erros} de {len(relatorio)} planilhas falharam.")
+                else:
+                    st.success(f"{len(relatorio)} planilhas processadas, "
+                               f"{sum(item['atualizadas'] for item in relatorio)} linhas atualizadas.")
+
+    mostrar_diagnostico = st.checkbox("Mostrar diagnóstico de desempenho")
+
+    st.caption(
+        f"Modelo {modelo_atual.version} carregado em {modelo_atual.load_seconds:.2f}s "
+        f"(artefatos de {modelo_atual.artifact_bytes / 1e6:.1f} MB)"
+    )
 
 # Título e descrição do aplicativo
 st.markdown("## 🔍 Análise de Sentimento de Comentários")
@@ -157,41 +141,85 @@ if st.button("Analisar Sentimento"):
     st.session_state.contador_analises += 1
 
     if text_input.strip():
-        # Transformar o texto e prever o sentimento
-        sentimento_vec = vectorizer.transform([text_input])  # Passar como lista
-        sentimento_pred = model.predict(sentimento_vec)
-
-        # Exibir resultado com formatação
-        st.markdown("#### 🎯 Resultado da Análise:")
-        if sentimento_pred[0] == "Positivo": 
-            st.success(f"Sentimento Previsto: **Positivo** 😊")
-        elif sentimento_pred[0] == "Negativo":
-            st.error(f"Sentimento Previsto: **Negativo** 😠")
-        else:
-            st.info(f"Sentimento Previsto: **Neutro** 😐")
+        # Transformar o texto e prever o sentimento (comentários repetidos vêm do cache)
+        sentimento_pred = predict_cached([text_input], loaded=modelo_atual)
+
+        # A previsão fica na sessão para que o feedback (que reexecuta o script) saiba o que avaliar
+        st.session_state.ultima_previsao = {
+            'comentario': text_input,
+            'sentimento': sentimento_pred[0],
+            'versao': modelo_atual.version,
+            'avaliada': False,
+        }
+    else:
+        st.session_state.pop('ultima_previsao', None)
+        st.warning("⚠️ Por favor, insira um comentário para analisar o sentimento.")
 
-        # Solicitar feedback do usuário
+ultima_previsao = st.session_state.get('ultima_previsao')
+if ultima_previsao:
+    # Exibir resultado com formatação
+    st.markdown("#### 🎯 Resultado da Análise:")
+    if ultima_previsao['sentimento'] == "Positivo":
+        st.success(f"Sentimento Previsto: **Positivo** 😊")
+    elif ultima_previsao['sentimento'] == "Negativo":
+        st.error(f"Sentimento Previsto: **Negativo** 😠")
+    else:
+        st.info(f"Sentimento Previsto: **Neutro** 😐")
+
+    # Solicitar feedback do usuário
+    if not ultima_previsao['avaliada']:
         feedback = st.radio(
             "Selecione o sentimento correto (se o modelo errou):",
             options=["Modelo está correto", "Modelo está errado"],
             index=None
         )
-          # Atualizar contadores de acertos
-        if feedback == "Modelo está correto":
-            st.session_state.acertos += 1
-            st.session_state.total_previsoes += 1
-        else:
+        sentimento_correto = ultima_previsao['sentimento']
+        if feedback == "Modelo está errado":
+            sentimento_correto = st.selectbox(
+                "Qual é o sentimento correto?",
+                options=[sentimento for sentimento in SENTIMENTS if sentimento != ultima_previsao['sentimento']]
+            )
+        if feedback is not None and st.button("Enviar avaliação"):
+            # Gravada para o próximo ajuste incremental do modelo (feito em segundo plano)
+            get_feedback_learner().record(ultima_previsao['comentario'], ultima_previsao['sentimento'],
+                                          sentimento_correto, ultima_previsao['versao'])
+            ultima_previsao['avaliada'] = True
+
+            # Atualizar contadores de acertos
+            if feedback == "Modelo está correto":
+                st.session_state.acertos += 1
             st.session_state.total_previsoes += 1
+    else:
+        st.caption("✅ Avaliação registrada. Obrigado!")
 
-        # Calcular e exibir a acurácia
+    # Calcular e exibir a acurácia
+    if st.session_state.total_previsoes:
         acuracia = (st.session_state.acertos / st.session_state.total_previsoes) * 100
         st.markdown(
             f"**📊 Acurácia Atual (baseada em {st.session_state.total_previsoes} previsões):** "
             f"<span style='color:green;font-size:20px'><b>{acuracia:.2f}%</b></span>",
             unsafe_allow_html=True
         )
+
+# Acurácia de cada versão do modelo segundo as avaliações de todos os usuários
+with st.expander("Acurácia por versão do modelo"):
+    aprendizado = get_feedback_learner()
+    acuracia_versoes = aprendizado.store.accuracy_by_version()
+    if acuracia_versoes:
+        st.dataframe(pd.DataFrame([
+            {'Versão': item['version'], 'Avaliações': item['feedback'], 'Acurácia': f"{item['accuracy']:.1%}",
+             'Em uso': '✅' if item['version'] == modelo_atual.version else ''}
+            for item in acuracia_versoes
+        ]), hide_index=True)
     else:
-        st.warning("⚠️ Por favor, insira um comentário para analisar o sentimento.")
+        st.caption("Nenhuma avaliação registrada ainda.")
+    st.caption(
+        f"{aprendizado.store.pending_count()} avaliações aguardando o próximo ajuste do modelo "
+        f"(feito automaticamente a cada {aprendizado.min_feedback})."
+        + (" Ajuste em andamento..." if aprendizado.updating else "")
+    )
+    if aprendizado.last_error is not None:
+        st.warning(f"Último ajuste do modelo falhou: {aprendizado.last_error}")
         
 #st.session_state.acertos = 0
 #st.session_state.total_previsoes = 0
@@ -200,49 +228,157 @@ if st.button("Analisar Sentimento"):
 
 st.markdown("---")
 
+# Hash do arquivo enviado, calculado uma única vez por upload (o Streamlit reexecuta o script a cada interação)
+def digest_do_upload(arquivo):
+    hashes = st.session_state.setdefault('hashes_uploads', {})
+    identificador = getattr(arquivo, 'file_id', None)
+    if identificador is None:
+        return file_digest(arquivo)
+    if identificador not in hashes:
+        hashes[identificador] = file_digest(arquivo)
+    return hashes[identificador]
+
 # Upload de CSV para análise em massa
 st.markdown("### 📂 Faça upload de um arquivo CSV com comentários:")
-uploaded_file = st.file_uploader("Escolha um arquivo CSV (deve possuir pelo menos uma coluna chamada 'Comentário')", type=["csv"])
+tipos_aceitos = ["csv", "gz"] + (["parquet", "arrow", "feather"] if PYARROW_AVAILABLE else [])
+uploaded_file = st.file_uploader("Escolha um arquivo CSV, CSV compactado (.csv.gz), Parquet ou Arrow "
+                                 "(deve possuir pelo menos uma coluna chamada 'Comentário')", type=tipos_aceitos)
 
 if uploaded_file:
-    data = pd.read_csv(uploaded_file, encoding='iso-8859-1', sep=';', on_bad_lines='skip')
-
+    # Arquivos grandes são lidos em blocos, apenas a coluna de comentários, com memória constante
+    modo_streaming = st.checkbox(
+        "Processar em blocos (arquivos grandes)",
+        help="Lê apenas a coluna 'Comentário', em blocos, e grava os resultados em um arquivo temporário."
+    )
+
+    # Processos usados na classificação (arquivos grandes são divididos entre eles)
+    processos = 1
+    if DEFAULT_WORKERS > 1:
+        processos = st.slider("Processos para a análise:", min_value=1, max_value=DEFAULT_WORKERS,
+                              value=DEFAULT_WORKERS)
+
+    # Formato do arquivo de resultados (Parquet e gzip reduzem bastante o tamanho do download)
+    formatos_saida = {'CSV': 'csv', 'CSV compactado (.csv.gz)': 'csv.gz'}
+    if PYARROW_AVAILABLE:
+        formatos_saida['Parquet'] = 'parquet'
+    formato_saida = formatos_saida[st.radio("Formato do download:", list(formatos_saida), horizontal=True)]
+
+    # Apenas as primeiras linhas; o arquivo inteiro só é lido quando a análise precisa ser feita
+    preview = read_table(uploaded_file, rows=5)
+    uploaded_file.seek(0)
     st.write("📊 **Dados carregados com sucesso!**")
+    st.dataframe(preview)
 
-    st.dataframe(data.head())
+    # Análises guardadas pelo conteúdo do arquivo + versão do modelo: interagir com a página ou
+    # enviar de novo o mesmo arquivo não refaz previsões, contagens e nuvens de palavras
+    cache_analises = get_analysis_cache()
+    chave_analise = AnalysisCache.key(digest_do_upload(uploaded_file), modelo_atual.version, modo_streaming)
 
+    resultado = None
     # Botão para iniciar a análise em massa
     if st.button("Analisar Sentimentos no CSV"):
-        with st.spinner("Carregando..."):
+        resultado = cache_analises.get(chave_analise)
+        if resultado is not None:
+            st.caption("Resultado reaproveitado: este arquivo já foi analisado com a mesma versão do modelo.")
+        else:
             progress_bar = st.progress(0)
-            for i in range(101):
-                time.sleep(0.05)
-                progress_bar.progress(i)
-
-        # Vetorizar os comentários
-        comentarios_vec = vectorizer.transform(data['Comentário'])
-
-        # Prever sentimentos
-        data['Sentimento'] = model.predict(comentarios_vec)
 
+            if modo_streaming:
+                # Progresso real: bytes já lidos do arquivo e linhas classificadas por segundo
+                def update_progress(rows, seconds):
+                    progress_bar.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0),
+                                          text=f"{rows} linhas processadas ({rows / max(seconds, 1e-9):.0f} linhas/s)")
+
+                saida = analyze_csv_stream(uploaded_file, progress=update_progress, loaded=modelo_atual,
+                                           workers=processos, output_format=formato_saida)
+                progress_bar.progress(1.0, text=f"{saida.rows} linhas processadas em {saida.seconds:.1f}s")
+
+                # Nada fica em memória; o arquivo completo serve o download e a tabela paginada
+                resultado = AnalysisResult(saida.rows, saida.sentiment_counts, saida.word_frequencies, None,
+                                           output_path=saida.output_path, output_format=formato_saida,
+                                           seconds=saida.seconds)
+            else:
+                with stage('read_csv') as medicao:
+                    data = read_table(uploaded_file)
+                    medicao.rows = len(data)
+
+                # Vetorizar e prever os sentimentos (cada comentário distinto é vetorizado uma única vez)
+                cache_stats = {}
+                inicio = time.perf_counter()
+                data['Comentário'] = data['Comentário'].fillna('').astype(str)
+                data['Sentimento'], preenchidos = predict_comments(data['Comentário'], loaded=modelo_atual,
+                                                                   stats=cache_stats, workers=processos)
+                duracao = time.perf_counter() - inicio
+                progress_bar.progress(1.0, text=f"{len(data)} linhas processadas "
+                                                f"({len(data) / max(duracao, 1e-9):.0f} linhas/s)")
+                st.caption(
+                    f"{cache_stats['unique']} comentários distintos em {cache_stats['total']} linhas; "
+                    f"{cache_stats['hits']} já estavam no cache "
+                    f"(taxa de acerto geral: {get_prediction_cache().stats()['hit_rate']:.0%})"
+                )
+
+                # Frequência das palavras de cada sentimento, calculada em uma única passada e usada
+                # tanto no diagrama de Sankey quanto nas nuvens de palavras
+                with stage('word_frequencies', rows=len(data)):
+                    contagem_palavras = count_words(data['Comentário'][preenchidos], data['Sentimento'][preenchidos])
+
+                resultado = AnalysisResult(len(data), data['Sentimento'][preenchidos].value_counts(), contagem_palavras,
+                                           data, cache_stats=cache_stats, seconds=duracao)
+
+            # Pegando as palavras do Sankey de forma proporcional
+            resultado.sankey_words = sankey_top_words(resultado.word_frequencies, resultado.sentiment_counts)
+
+            with stage('wordcloud_render'):
+                # Criar as nuvens de palavras a partir das mesmas frequências (sem tokenizar o texto de novo)
+                for sentimento in SENTIMENTS:
+                    frequencias = wordcloud_frequencies(resultado.word_frequencies.get(sentimento, Counter()))
+                    nuvem = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(frequencias)
+                    resultado.wordclouds[sentimento] = nuvem.to_array()
+
+            cache_analises.put(chave_analise, resultado)
+        st.session_state.analise_csv = chave_analise
+    elif st.session_state.get('analise_csv') == chave_analise:
+        # Outro widget foi alterado: o resultado continua na tela, sem recalcular nada
+        resultado = cache_analises.get(chave_analise)
+
+    if resultado is not None:
         # Exibir resultado
         st.markdown("#### 📋 Resultado da Análise:")
-        st.dataframe(data[['Comentário', 'Sentimento']])
+        # Só a página atual vai para o navegador; filtro e busca são feitos no índice do servidor
+        with stage('result_index', rows=resultado.rows):
+            indice_resultado = resultado.viewer()
+        coluna_filtro, coluna_busca = st.columns([1, 2])
+        filtro_sentimento = coluna_filtro.selectbox("Sentimento:", ["Todos"] + SENTIMENTS)
+        busca = coluna_busca.text_input("Buscar nos comentários:").strip()
+        sentimento_filtrado = None if filtro_sentimento == "Todos" else filtro_sentimento
+
+        if len(busca) >= SEARCH_MIN_CHARS and not indice_resultado.searchable:
+            with st.spinner("Indexando os comentários para a busca (apenas na primeira vez)..."):
+                with stage('result_search_index', rows=resultado.rows):
+                    linhas_filtradas = indice_resultado.count(sentimento_filtrado, busca)
+        else:
+            linhas_filtradas = indice_resultado.count(sentimento_filtrado, busca)
+        total_paginas = max(math.ceil(linhas_filtradas / PAGE_SIZE), 1)
+        # A chave inclui os filtros: mudar o filtro volta para a primeira página
+        pagina = st.number_input(f"Página (de {total_paginas}):", min_value=1, max_value=total_paginas, value=1,
+                                 key=f"pagina_{chave_analise}_{sentimento_filtrado}_{busca}")
+        with stage('result_page'):
+            st.dataframe(indice_resultado.page(pagina - 1, sentimento_filtrado, busca))
+        st.caption(f"{linhas_filtradas} de {resultado.rows} linhas.")
+
+        sentiment_count_2 = pd.Series(resultado.sentiment_counts, dtype='int64').sort_values(ascending=False)
 
         # Gráficos de distribuição dos sentimentos usando plotly
         st.markdown("#### 📊 Visualização dos Sentimentos:")
 
-        # Contagem de cada sentimento
-        sentiment_count = data['Sentimento'].value_counts(normalize=True).reset_index()
+        # Proporção de cada sentimento
+        sentiment_count = (sentiment_count_2 / sentiment_count_2.sum()).reset_index()
         sentiment_count.columns = ['Sentimento', 'Proporcao']
 
         sentiment_count['Proporcao'] = sentiment_count['Proporcao'] * 100
 
         # Adicionar as porcentagens para cada sentimento
         sentiment_count['Proporcao_Label'] = sentiment_count['Proporcao'].round(2).astype(str) + '%'
-
-        # Contagem de cada sentimento
-        sentiment_count_2 = data['Sentimento'].value_counts()
         
         # Exibir contagens
         st.markdown("##### Sentimentos identificados:")
@@ -340,34 +476,16 @@ if uploaded_file:
 
         st.plotly_chart(fig_side_by_side)
 
-        not_words = [
-            'a', 'à', 'logo', 'desde', 'podem', 'além', 'q', 'sim', 'nao', 'falando', 'lá', 'meus', 'ficou', 'queren', 'sei', 'hoje', 'aqui', 'ficar', 'te', 'mas', 'neste', 'nesta', 'nessa', 'nesse', 'e', 'vou', 'vejo', 'entrará', 'estava', 'meu', 've', 'vê', 'ter', 'logo', 'fosse', 'horas', 'ainda', 'dia', 'falar', 'minuto', 'minutos', 'hora', 'pela', 'dar', 'então', 'sou', 'vou', 'ficaram', 'agora', 'os', 'me', 'algmas', 'algumas', 'alguns', 'ali', 'ambos', 'antes', 'ao', 'aos', 'apenas', 'apoio', 'apos', 'após', 'aquela', 'aquelas', 'aquele', 'aqueles', 'aquilo', 'as', 'às', 'ate', 'até', 'atras', 'atrás', 'bem', 'bom', 'cada', 'certa', 'certas', 'certeza', 'certo', 'certos', 'com', 'como', 'conforme', 'contra', 'contudo', 'da', 'da', 'dá', 'dado', 'das', 'de', 'dela', 'delas', 'dele', 'deles', 'dessa', 'dessas', 'desse', 'desses', 'desta', 'destas', 'deste', 'destes', 'deve', 'devem', 'devera', 'deverá', 'deverao', 'deverão', 'deveria', 'deveriam', 'disse', 'diz', 'dizem', 'dizer', 'do', 'dos', 'duas', 'duplo', 'duplos', 'ela', 'elas', 'ele', 'eles', 'em', 'em', 'enquanto', 'essa', 'essas', 'esse', 'esses', 'esta', 'estamos', 'estão', 'este', 'estes', 'essa', 'esses', 'e', 'eu', 'ela', 'elas', 'isto', 'isso', 'isso', 'isto', 'ja', 'já', 'jamais', 'jamas', 'lugar', 'mais', 'mas', 'mesmo', 'mesmos', 'muito', 'muitos', 'na', 'nas', 'no', 'nos', 'não', 'nós', 'nem', 'nosso', 'nossos', 'ou', 'outra', 'outras', 'outro', 'outros', 'para', 'para', 'para', 'pelo', 'pelas', 'pelo', 'perante', 'pois', 'por', 'porque', 'portanto', 'posso', 'pouca', 'poucas', 'pouco', 'poucos', 'primeiro', 'propria', 'própria', 'próprias', 'próprio', 'próprios', 'quais', 'qual', 'qualquer', 'quando', 'quanto', 'quantos', 'que', 'quem', 'quer', 'quero', 'se', 'seja', 'sejam', 'sejamos', 'sem', 'sempre', 'sendo', 'ser', 'sera', 'será', 'serao', 'serão', 'seria', 'seriam', 'seu', 'seus', 'si', 'sido', 'so', 'só', 'sob', 'sobre', 'sua', 'suas', 'talvez', 'tambem', 'também', 'tanta', 'tantas', 'tanto', 'tao', 'tão', 'te', 'tem', 'temos', 'tendo', 'tenha', 'tenham', 'tenhamos', 'tenho', 'tens', 'ter', 'tera', 'terá', 'terao', 'terão', 'teria', 'teriam', 'teu', 'teus', 'teve', 'tinha', 'tinham', 'tive', 'tivemos', 'tiver', 'tivera', 'tiveram', 'tiverem', 'tivermos', 'tivesse', 'tivessem', 'tivessemos', 'tivéssemos', 'toda', 'todas', 'todo', 'todos', 'tu', 'tua', 'tuas', 'tudo', 'ultimo', 'último', 'um', 'uma', 'umas', 'uns', 'vai', 'vao', 'vão', 'vem', 'vêm', 'vendo', 'ver', 'vez', 'vindo', 'vir', 'voce', 'você', 'voces', 'vocês', 'vos'
-            'a', 'o', 'é', 'mim', 'pra', 'há', 'foi', 'à', 'ainda', 'agora', 'fui', 'estou', 'depois', 'meu', 'p', '','algmas', 'algumas', 'alguns', 'ali', 'ambos', 'antes', 'ao', 'aos', 'apenas', 'apoio', 'apos', 'após', 'aquela', 'aquelas', 'aquele', 'aqueles', 'aquilo', 'as', 'às', 'ate', 'até', 'atras', 'atrás', 'bem', 'bom', 'cada', 'certa', 'certas', 'certeza', 'certo', 'certos', 'com', 'como', 'conforme', 'contra', 'contudo', 'da', 'da', 'dá', 'dado', 'das', 'de', 'dela', 'delas', 'dele', 'deles', 'dessa', 'dessas', 'desse', 'desses', 'desta', 'destas', 'deste', 'destes', 'deve', 'devem', 'devera', 'deverá', 'deverao', 'deverão', 'deveria', 'deveriam', 'disse', 'diz', 'dizem', 'dizer', 'do', 'dos', 'duas', 'duplo', 'duplos', 'ela', 'elas', 'ele', 'eles', 'em', 'em', 'enquanto', 'essa', 'essas', 'esse', 'esses', 'esta', 'estamos', 'estão', 'este', 'estes', 'essa', 'esses', 'e', 'eu', 'ela', 'elas', 'isto', 'isso', 'isso', 'isto', 'ja', 'já', 'jamais', 'jamas', 'lugar', 'mais', 'mas', 'mesmo', 'mesmos', 'muito', 'muitos', 'na', 'nas', 'no', 'nos', 'não', 'nós', 'nem', 'nosso', 'nossos', 'ou', 'outra', 'outras', 'outro', 'outros', 'para', 'para', 'para', 'pelo', 'pelas', 'pelo', 'perante', 'pois', 'por', 'porque', 'portanto', 'posso', 'pouca', 'poucas', 'pouco', 'poucos', 'primeiro', 'propria', 'própria', 'próprias', 'próprio', 'próprios', 'quais', 'qual', 'qualquer', 'quando', 'quanto', 'quantos', 'que', 'quem', 'quer', 'quero', 'se', 'seja', 'sejam', 'sejamos', 'sem', 'sempre', 'sendo', 'ser', 'sera', 'será', 'serao', 'serão', 'seria', 'seriam', 'seu', 'seus', 'si', 'sido', 'so', 'só', 'sob', 'sobre', 'sua', 'suas', 'talvez', 'tambem', 'também', 'tanta', 'tantas', 'tanto', 'tao', 'tão', 'te', 'tem', 'temos', 'tendo', 'tenha', 'tenham', 'tenhamos', 'tenho', 'tens', 'ter', 'tera', 'terá', 'terao', 'terão', 'teria', 'teriam', 'teu', 'teus', 'teve', 'tinha', 'tinham', 'tive', 'tivemos', 'tiver', 'tivera', 'tiveram', 'tiverem', 'tivermos', 'tivesse', 'tivessem', 'tivessemos', 'tivéssemos', 'toda', 'todas', 'todo', 'todos', 'tu', 'tua', 'tuas', 'tudo', 'ultimo', 'último', 'um', 'uma', 'umas', 'uns', 'vai', 'vao', 'vão', 'vem', 'vêm', 'vendo', 'ver', 'vez', 'vindo', 'vir', 'voce', 'você', 'voces', 'vocês', 'vos'
-        ]
 
          # Criar diagrama de Sankey
         st.markdown("#### 🧠 Diagrama de Sankey:")
         
-        palavras_positivas = data[data['Sentimento'] == 'Positivo']['Comentário'].dropna().astype(str).str.lower()
-        palavras_negativas = data[data['Sentimento'] == 'Negativo']['Comentário'].dropna().astype(str).str.lower()
-        palavras_neutras = data[data['Sentimento'] == 'Neutro']['Comentário'].dropna().astype(str).str.lower()
-        
-        # Remover palavras irrelevantes
-        palavras_positivas = ' '.join(palavras_positivas.apply(lambda x: ' '.join([word for word in x.split() if word not in not_words])))
-        palavras_negativas = ' '.join(palavras_negativas.apply(lambda x: ' '.join([word for word in x.split() if word not in not_words])))
-        palavras_neutras = ' '.join(palavras_neutras.apply(lambda x: ' '.join([word for word in x.split() if word not in not_words])))
-
-        prop_pos = int((sentiment_count_2.get('Positivo', 0)/sentiment_count_2.sum()).round(1)*10)+2
-        prop_neg = int((sentiment_count_2.get('Negativo', 0)/sentiment_count_2.sum()).round(1)*10)+2
-        prop_neu = int((sentiment_count_2.get('Neutro', 0)/sentiment_count_2.sum()).round(1)*10)+2
-        
-        # Pegando as palavras de forma proporcional
-        freq_positivas = Counter(palavras_positivas.split()).most_common(prop_pos)
-        freq_negativas = Counter(palavras_negativas.split()).most_common(prop_neg)
-        freq_neutras = Counter(palavras_neutras.split()).most_common(prop_neu)
+        # Palavras mais frequentes de cada sentimento (calculadas junto com a análise)
+        palavras_sankey = resultado.sankey_words
+        freq_positivas = palavras_sankey['Positivo']
+        freq_negativas = palavras_sankey['Negativo']
+        freq_neutras = palavras_sankey['Neutro']
 
-        sentiment_count_2.get('Neutro', 0)
-        
         # Criando as ligações para o gráfico de Sankey
         sentimentos = ['Positivo', 'Negativo', 'Neutro']
         
@@ -399,71 +517,74 @@ if uploaded_file:
         node_border = ['#a9f0a1' if sentimento == 'Positivo' else '#f57171' if sentimento == 'Negativo' else '#f7f55c' 
                for sentimento in sentimentos]
         
-        # Criar gráfico de Sankey
-        fig_sankey = go.Figure(go.Sankey(
-            node=dict(
-                pad=15,
-                thickness=20,
-                line=dict(color=node_border, width=0.5),
-                color="gray",
-                label=labels
-            ),
-            link=dict(
-                source=origem,
-                target=destino,
-                value=valores,
-                color=link_colors
-            )
-        ))
+        with stage('sankey_render'):
+            # Criar gráfico de Sankey
+            fig_sankey = go.Figure(go.Sankey(
+                node=dict(
+                    pad=15,
+                    thickness=20,
+                    line=dict(color=node_border, width=0.5),
+                    color="gray",
+                    label=labels
+                ),
+                link=dict(
+                    source=origem,
+                    target=destino,
+                    value=valores,
+                    color=link_colors
+                )
+            ))
         
-        fig_sankey.update_layout(font_size=10)
-        st.plotly_chart(fig_sankey)
+            fig_sankey.update_layout(font_size=10)
+            st.plotly_chart(fig_sankey)
 
         # Gerar uma WordCloud para cada sentimento
         st.markdown("#### ☁️ Nuvens de Palavras por Sentimento:")
 
-        # Filtrar comentários por sentimento
-        comments_positive = data[data['Sentimento'] == 'Positivo']['Comentário'].dropna().astype(str).str.lower()
-        comments_negative = data[data['Sentimento'] == 'Negativo']['Comentário'].dropna().astype(str).str.lower()
-        comments_neutral = data[data['Sentimento'] == 'Neutro']['Comentário'].dropna().astype(str).str.lower()
-
-        # Gerar uma única string para cada sentimento
-        positive_words = ' '.join(comments_positive)
-        negative_words = ' '.join(comments_negative)
-        neutral_words = ' '.join(comments_neutral)
-
-        # Remover palavras irrelevantes
-        positive_filtered = ' '.join(word for word in positive_words.split() if word not in not_words)
-        negative_filtered = ' '.join(word for word in negative_words.split() if word not in not_words)
-        neutral_filtered = ' '.join(word for word in neutral_words.split() if word not in not_words)
-
-        # Criar as nuvens de palavras para cada sentimento
-        positive_wordcloud = WordCloud(width=800, height=400, background_color='white').generate(positive_filtered)
-        negative_wordcloud = WordCloud(width=800, height=400, background_color='white').generate(negative_filtered)
-        neutral_wordcloud = WordCloud(width=800, height=400, background_color='white').generate(neutral_filtered)
-
-        # Exibir as nuvens de palavras para cada sentimento usando plotly
+        # Exibir as nuvens de palavras (imagens já geradas e guardadas com o resultado) usando plotly
         st.markdown("**🟩 Positivo:**")
-        st.plotly_chart(go.Figure(go.Image(z=positive_wordcloud.to_array())))
+        st.plotly_chart(go.Figure(go.Image(z=resultado.wordclouds['Positivo'])))
 
         st.markdown("**🟥 Negativo:**")
-        st.plotly_chart(go.Figure(go.Image(z=negative_wordcloud.to_array())))
+        st.plotly_chart(go.Figure(go.Image(z=resultado.wordclouds['Negativo'])))
 
         st.markdown("**🟨 Neutro:**")
-        st.plotly_chart(go.Figure(go.Image(z=neutral_wordcloud.to_array())))
+        st.plotly_chart(go.Figure(go.Image(z=resultado.wordclouds['Neutro'])))
 
         st.success("Tudo pronto!")
         
-        # Download dos resultados em CSV
+        # Download dos resultados no formato escolhido
         st.markdown("#### 📥 Baixe os resultados:")
-        csv_result = data.to_csv(index=False)
+        # Gerado só quando o botão é clicado: trocar de página, filtro ou busca não lê o arquivo de
+        # resultados de novo. Os argumentos padrão fixam o resultado e o formato desta execução.
+        def gerar_download(resultado=resultado, formato=formato_saida):
+            with stage('write_results', rows=resultado.rows):
+                dados = resultado.export(formato)
+            cache_analises.trim()
+            return dados
+
+        extensao, tipo_mime = OUTPUT_FORMATS[formato_saida]
         st.download_button(
-            label="📥 Download CSV com Sentimentos",
-            data=csv_result,
-            file_name="resultado_sentimentos.csv",
-            mime="text/csv"
+            label="📥 Download dos resultados com Sentimentos",
+            data=gerar_download,
+            file_name=f"resultado_sentimentos{extensao}",
+            mime=tipo_mime
         )
 
+# Painel de diagnóstico: tempo, linhas e memória de cada etapa desde o início do processo
+if mostrar_diagnostico:
+    st.markdown("---")
+    st.markdown("### ⏱️ Diagnóstico de desempenho")
+    metricas_etapas = get_stage_metrics()
+    metricas_etapas.flush()
+    resumo = metricas_etapas.summary()
+    if resumo:
+        st.dataframe(pd.DataFrame.from_dict(resumo, orient='index'))
+        with st.expander("Últimas medições"):
+            st.dataframe(pd.DataFrame(list(metricas_etapas.recent)[::-1]))
+    else:
+        st.info("Nenhuma etapa medida ainda.")
+
 # Rodapé
 st.markdown("---")
 st.markdown("**Criado por [Andrey Alves](https://github.com/dreymond1)** 🚀")
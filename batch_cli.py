@@ -0,0 +1,110 @@
+# Análise de sentimentos em lote, sem Streamlit.
+#
+# Exemplo:
+#   python batch_cli.py comentarios.csv exportacao.jsonl --output-dir resultados --workers 4
+#
+# Para cada arquivo de entrada são gravados <arquivo>.sentimentos.csv (comentário e sentimento)
+# e <arquivo>.estatisticas.json (contagem por sentimento, palavras mais frequentes e vazão).
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from compact_model import COMPACT_MODEL_PATH
+from csv_pipeline import CSV_CHUNK_ROWS, OUTPUT_FORMATS, analyze_csv_stream
+from instrumentation import METRICS_PATH, configure_metrics, get_stage_metrics, log_stages
+from model_registry import MODEL_PATH, VECTORIZER_PATH, ModelRegistry
+from word_frequencies import SENTIMENTS
+
+# Quantidade de palavras por sentimento gravadas nas estatísticas
+TOP_WORDS = 50
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Classifica o sentimento dos comentários de arquivos CSV ou JSONL.")
+    parser.add_argument('inputs', nargs='+', help="Arquivos de entrada (.csv separado por ';' em ISO-8859-1, .jsonl, "
+                                                  ".parquet ou .arrow/.feather; .gz para CSV/JSONL compactados)")
+    parser.add_argument('--output-dir', default='.', help="Pasta onde os resultados serão gravados")
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet', 'arrow'],
+                        help="Força o formato de entrada (padrão: pela extensão)")
+    parser.add_argument('--output-format', choices=list(OUTPUT_FORMATS), default='csv',
+                        help="Formato do arquivo com as previsões")
+    parser.add_argument('--chunk-rows', type=int, default=CSV_CHUNK_ROWS, help="Linhas lidas por bloco")
+    parser.add_argument('--workers', type=int, default=1, help="Processos usados na classificação")
+    parser.add_argument('--top-words', type=int, default=TOP_WORDS, help="Palavras por sentimento nas estatísticas")
+    parser.add_argument('--model', default=MODEL_PATH, help="Arquivo do modelo Naive Bayes")
+    parser.add_argument('--vectorizer', default=VECTORIZER_PATH, help="Arquivo do vetorizador")
+    parser.add_argument('--compact-model', default=COMPACT_MODEL_PATH,
+                        help="Pasta do modelo compacto; quando existe, é usada no lugar de --model/--vectorizer "
+                             "('' desativa)")
+    parser.add_argument('--quiet', action='store_true', help="Não exibe o progresso")
+    parser.add_argument('--verbose', action='store_true', help="Exibe em stderr o log JSON de cada etapa medida")
+    parser.add_argument('--metrics-path', default=METRICS_PATH,
+                        help="Arquivo de métricas do Prometheus ({process} vira o nome do script; '' desativa)")
+    return parser.parse_args(argv)
+
+
+def output_paths(input_path, output_dir, output_format='csv'):
+    # Mantém a extensão no nome para que entrada.csv e entrada.jsonl não se sobrescrevam
+    base = os.path.basename(input_path)
+    return (os.path.join(output_dir, f"{base}.sentimentos{OUTPUT_FORMATS[output_format][0]}"),
+            os.path.join(output_dir, f"{base}.estatisticas.json"))
+
+
+# Estatísticas agregadas de um arquivo processado
+def build_stats(input_path, result, model_version, top_words):
+    return {
+        'arquivo': input_path,
+        'versao_modelo': model_version,
+        'linhas': result.rows,
+        'segundos': round(result.seconds, 3),
+        'linhas_por_segundo': round(result.rows / result.seconds, 1) if result.seconds else None,
+        'sentimentos': {sentiment: result.sentiment_counts.get(sentiment, 0) for sentiment in SENTIMENTS},
+        'palavras_frequentes': {
+            sentiment: result.word_frequencies[sentiment].most_common(top_words)
+            for sentiment in SENTIMENTS if sentiment in result.word_frequencies
+        },
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format='%(message)s')
+    # O progresso já resume cada arquivo; a linha JSON de cada etapa só com --verbose
+    log_stages(args.verbose)
+    configure_metrics(args.metrics_path)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    loaded = ModelRegistry(args.model, args.vectorizer, compact_path=args.compact_model).get()
+
+    total_rows = 0
+    start = time.perf_counter()
+    for input_path in args.inputs:
+        predictions_path, stats_path = output_paths(input_path, args.output_dir, args.output_format)
+
+        def progress(rows, seconds, name=os.path.basename(input_path)):
+            logging.info("%s: %d linhas (%.0f linhas/s)", name, rows, rows / seconds if seconds else 0)
+
+        result = analyze_csv_stream(input_path, output_path=predictions_path, chunk_rows=args.chunk_rows,
+                                    progress=None if args.quiet else progress, loaded=loaded,
+                                    workers=args.workers, file_format=args.format,
+                                    output_format=args.output_format)
+
+        with open(stats_path, 'w', encoding='utf-8') as file:
+            json.dump(build_stats(input_path, result, loaded.version, args.top_words), file,
+                      ensure_ascii=False, indent=2)
+        total_rows += result.rows
+        print(f"{input_path}: {result.rows} linhas em {result.seconds:.2f}s "
+              f"({result.rows / max(result.seconds, 1e-9):.0f} linhas/s) -> {predictions_path}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Total: {total_rows} linhas em {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):.0f} linhas/s)")
+    # Garante que o arquivo de métricas reflita a execução inteira
+    get_stage_metrics().flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import random
+import re
+import threading
+import time
+
+from sheets_sync import column_to_index
+
+_RANGE = re.compile(r"^(?P<sheet>.+)!(?P<c1>[A-Za-z]+)(?P<r1>\d*)(?::(?P<c2>[A-Za-z]+)(?P<r2>\d*))?$")
+
+
+# Mesmos atributos usados do googleapiclient.errors.HttpError (status_code e resp.status)
+class FakeHttpError(Exception):
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.resp = {'status': str(status)}
+        if retry_after is not None:
+            self.resp['retry-after'] = str(retry_after)
+
+
+class _Request:
+
+    def __init__(self, service, action):
+        self._service = service
+        self._action = action
+
+    def execute(self):
+        if self._service.latency:
+            time.sleep(self._service.latency)
+        self._service._maybe_fail()
+        return self._action()
+
+
+# Imitação em memória da API do Google Sheets (apenas as chamadas usadas por sheets_sync).
+# Cada aba é uma grade {(linha, coluna): valor}, com linhas começando em 1 e colunas em 0.
+# latency simula o tempo de rede de cada chamada; error_rate faz uma fração das chamadas falhar
+# com error_status (429 = cota excedida), e fail_next() programa falhas para as próximas chamadas.
+class FakeSheetsService:
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=429, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.sheets = {}
+        self.row_counts = {}
+        self.calls = []
+        self.failures = 0
+        self._scheduled_failures = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail_next(self, status, times=1):
+        with self._lock:
+            self._scheduled_failures.extend([status] * times)
+
+    def _maybe_fail(self):
+        with self._lock:
+            if self._scheduled_failures:
+                status = self._scheduled_failures.pop(0)
+            elif self.error_rate and self._random.random() < self.error_rate:
+                status = self.error_status
+            else:
+                return
+            self.failures += 1
+        raise FakeHttpError(status)
+
+    def add_sheet(self, spreadsheet_id, sheet_name, rows, row_count=None):
+        grid = {}
+        for row_number, row in enumerate(rows, start=1):
+            for column, value in enumerate(row):
+                if value != '':
+                    grid[(row_number, column)] = value
+        self.sheets[(spreadsheet_id, sheet_name)] = grid
+        self.row_counts[(spreadsheet_id, sheet_name)] = row_count or len(rows)
+
+    def column_values(self, spreadsheet_id, sheet_name, column):
+        grid = self.sheets[(spreadsheet_id, sheet_name)]
+        index = column_to_index(column)
+        last_row = self.row_counts[(spreadsheet_id, sheet_name)]
+        return [grid.get((row, index), '') for row in range(1, last_row + 1)]
+
+    # A API devolve o próprio serviço em spreadsheets() e values()
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def _parse(self, spreadsheet_id, range_name):
+        match = _RANGE.match(range_name)
+        if not match:
+            raise ValueError(f"Intervalo inválido: {range_name!r}")
+        key = (spreadsheet_id, match['sheet'])
+        if key not in self.sheets:
+            raise ValueError(f"Aba não encontrada: {match['sheet']!r}")
+        first_column = column_to_index(match['c1'])
+        last_column = column_to_index(match['c2'] or match['c1'])
+        first_row = int(match['r1'] or 1)
+        last_row = int(match['r2'] or self.row_counts[key])
+        return key, first_row, last_row, first_column, last_column
+
+    def get(self, spreadsheetId, range=None, ranges=None, fields=None):
+        with self._lock:
+            self.calls.append(('get', spreadsheetId, range or ranges))
+        if range is None:
+            return _Request(self, lambda: self._metadata(spreadsheetId, ranges))
+        return _Request(self, lambda: self._read(spreadsheetId, range))
+
+    def batchUpdate(self, spreadsheetId, body):
+        with self._lock:
+            self.calls.append(('batchUpdate', spreadsheetId, [item['range'] for item in body['data']]))
+        return _Request(self, lambda: self._write(spreadsheetId, body))
+
+    def _metadata(self, spreadsheet_id, ranges):
+        sheets = []
+        for (sid, name), row_count in self.row_counts.items():
+            if sid == spreadsheet_id and (not ranges or name in ranges):
+                sheets.append({'properties': {'title': name, 'gridProperties': {'rowCount': row_count}}})
+        return {'sheets': sheets}
+
+    # Como a API real, omite linhas vazias no final e células vazias no fim de cada linha
+    def _read(self, spreadsheet_id, range_name):
+        key, first_row, last_row, first_column, last_column = self._parse(spreadsheet_id, range_name)
+        grid = self.sheets[key]
+        values = []
+        for row in range(first_row, last_row + 1):
+            cells = [grid.get((row, column), '') for column in range(first_column, last_column + 1)]
+            while cells and cells[-1] == '':
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        result = {'range': range_name, 'majorDimension': 'ROWS'}
+        if values:
+            result['values'] = values
+        return result
+
+    def _write(self, spreadsheet_id, body):
+        updated = 0
+        for item in body['data']:
+            key, first_row, _, first_column, _ = self._parse(spreadsheet_id, item['range'])
+            grid = self.sheets[key]
+            for row_offset, row in enumerate(item['values']):
+                for column_offset, value in enumerate(row):
+                    grid[(first_row + row_offset, first_column + column_offset)] = value
+                    updated += 1
+        return {'spreadsheetId': spreadsheet_id, 'totalUpdatedCells': updated}
+
@@ -0,0 +1,283 @@
+# Benchmarks reproduzíveis das etapas do aplicativo.
+#
+# Exemplo (a partir da raiz do repositório):
+#   python -m benchmarks.run_benchmarks --sizes 1k,100k
+#   python -m benchmarks.run_benchmarks --sizes 1k,100k --save-baseline
+#
+# Mede a partida a frio (do modelo e do app.py inteiro), a carga do modelo, a latência de um
+# comentário, a vazão de vetorização + previsão do CSV, a agregação das visualizações e o
+# processamento de uma planilha em um serviço Sheets falso. Os resultados vão para benchmarks/results/ e são
+# comparados com benchmarks/baseline.json; pioras acima de --threshold são sinalizadas.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.fake_sheets import FakeSheetsService
+from benchmarks.synthetic import SIZES, generate_comments, write_csv
+from csv_pipeline import COMMENT_COLUMN, CSV_OPTIONS, PYARROW_AVAILABLE, analyze_csv_stream, iter_comment_chunks
+from model_registry import MODEL_PATH, VECTORIZER_PATH, ModelRegistry, predict_sentiments
+from prediction_cache import PredictionCache
+from sheets_sync import SheetsStateStore, process_comments_and_sentiments
+from word_frequencies import count_words, sankey_top_words
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'sentimento_benchmarks')
+
+# Piora relativa tolerada antes de sinalizar uma regressão
+THRESHOLD = 0.10
+
+# Métricas em que um valor maior é melhor; nas demais, menor é melhor
+HIGHER_IS_BETTER = {'rows_per_second'}
+
+SINGLE_PREDICT_CALLS = 500
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+# Executa a etapa medindo o tempo; com memory=True repete sob tracemalloc para obter o pico
+# (separado para que o rastreamento não distorça o tempo)
+def measure(function, rows=None, memory=True):
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    result = {'seconds': round(seconds, 4)}
+    if rows:
+        result['rows'] = rows
+        result['rows_per_second'] = round(rows / seconds, 1) if seconds else None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            result['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+# Partida a frio: um interpretador novo importando os módulos e carregando o modelo
+def bench_cold_start(model_path, vectorizer_path, compact_path=None):
+    code = ("from model_registry import ModelRegistry; "
+            f"ModelRegistry({model_path!r}, {vectorizer_path!r}, compact_path={compact_path!r}).get()")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(BENCHMARKS_DIR))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True, env=env)
+    return {'seconds': round(time.perf_counter() - start, 4)}
+
+
+# Partida a frio do aplicativo: um interpretador novo executando o app.py uma vez, sem
+# navegador, pelo AppTest do Streamlit. Inclui a importação do Streamlit, plotly e wordcloud e a
+# carga do modelo (o app usa os arquivos com os nomes padrão na pasta atual).
+# script_seconds é o tempo da primeira execução da página, já com tudo importado.
+APP_PATH = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'app.py')
+
+_APP_COLD_START_CODE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=600).run()
+if app.exception:
+    sys.exit(app.exception[0].message)
+print(json.dumps({'import_seconds': imported - start, 'script_seconds': time.perf_counter() - imported}))
+"""
+
+
+def bench_app_cold_start():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(BENCHMARKS_DIR))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', _APP_COLD_START_CODE, APP_PATH], check=True, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+    stages = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {'seconds': round(seconds, 4), 'script_seconds': round(stages['script_seconds'], 4)}
+
+
+def bench_single_predict(loaded, calls=SINGLE_PREDICT_CALLS):
+    texts = list(generate_comments(calls, seed=7))
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        predict_sentiments([text], loaded=loaded)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': round(percentile(latencies, 0.50), 4), 'p99_ms': round(percentile(latencies, 0.99), 4)}
+
+
+def dataset_path(label, rows):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"comentarios_{label}.csv")
+    if not os.path.exists(path):
+        write_csv(path, rows)
+    return path
+
+
+# Cópias do mesmo conjunto em CSV compactado e Parquet, para comparar a leitura entre formatos
+def converted_dataset(path, output_format):
+    converted = path + ('.gz' if output_format == 'csv.gz' else '.parquet')
+    if not os.path.exists(converted):
+        data = pd.read_csv(path, dtype=str, **CSV_OPTIONS)
+        if output_format == 'csv.gz':
+            data.to_csv(converted, index=False, sep=CSV_OPTIONS['sep'], encoding=CSV_OPTIONS['encoding'],
+                        compression='gzip')
+        else:
+            data.to_parquet(converted, index=False)
+    return converted
+
+
+def bench_size(label, rows, loaded, memory, sheets_max_rows):
+    path = dataset_path(label, rows)
+    results = {}
+
+    def read_comments():
+        return pd.read_csv(path, usecols=[COMMENT_COLUMN], dtype=str, **CSV_OPTIONS)[COMMENT_COLUMN].fillna('')
+
+    results[f'read_csv_{label}'] = measure(read_comments, rows, memory)
+    comments = read_comments()
+
+    # Leitura em blocos só da coluna de comentários, nos demais formatos aceitos
+    formats = ['csv.gz'] + (['parquet'] if PYARROW_AVAILABLE else [])
+    for output_format in formats:
+        converted = converted_dataset(path, output_format)
+        results[f"read_{output_format.replace('.', '_')}_{label}"] = measure(
+            lambda: list(iter_comment_chunks(converted)), rows, memory)
+
+    # Vetorização + previsão do arquivo inteiro, sem cache nem deduplicação
+    results[f'csv_predict_{label}'] = measure(lambda: predict_sentiments(comments, loaded=loaded), rows, memory)
+    predictions = predict_sentiments(comments, loaded=loaded)
+
+    # Pipeline completo em blocos, com cache vazio (apenas deduplicação dentro de cada bloco)
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'saida.csv')
+        results[f'csv_pipeline_{label}'] = measure(
+            lambda: analyze_csv_stream(path, output_path=output, loaded=loaded,
+                                       cache=PredictionCache(disk_path=None)), rows, memory)
+
+    sentiment_counts = pd.Series(predictions).value_counts()
+    results[f'aggregation_{label}'] = measure(
+        lambda: sankey_top_words(count_words(comments, predictions), sentiment_counts), rows, memory)
+
+    sheet_rows = min(rows, sheets_max_rows)
+    results[f'sheets_sync_{label}'] = measure(
+        lambda: run_sheets_sync(comments[:sheet_rows]), sheet_rows, memory)
+    return results
+
+
+# Uma planilha nova a cada execução: cabeçalho + comentários sem sentimento
+def run_sheets_sync(comments):
+    service = FakeSheetsService()
+    service.add_sheet('benchmark', 'Aba', [['Comentário', 'Sentimento']] + [[comment] for comment in comments])
+    with tempfile.TemporaryDirectory() as tmp:
+        process_comments_and_sentiments(service, 'benchmark', 'Aba', 'A', 'B',
+                                        state_store=SheetsStateStore(os.path.join(tmp, 'estado.json')),
+                                        cache=PredictionCache(disk_path=None))
+
+
+# Compara com a linha de base: [(etapa, métrica, base, atual, variação)]
+def find_regressions(results, baseline, threshold=THRESHOLD):
+    regressions = []
+    for stage, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(stage, {}).get(metric)
+            if metric == 'rows' or not base or value is None:
+                continue
+            change = (value - base) / base
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append((stage, metric, base, value, change))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas da análise de sentimento.")
+    parser.add_argument('--sizes', default='1k,100k', help=f"Tamanhos separados por vírgula ({', '.join(SIZES)})")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--vectorizer', default=VECTORIZER_PATH)
+    parser.add_argument('--no-app', dest='app', action='store_false',
+                        help="Não mede a partida a frio do app.py (requer o Streamlit e os .pkl na pasta atual)")
+    parser.add_argument('--compact-model', help="Pasta do modelo compacto; mede também a carga e a latência com ele")
+    parser.add_argument('--sheets-max-rows', type=int, default=100000,
+                        help="Limite de linhas da planilha falsa (a grade fica inteira na memória)")
+    parser.add_argument('--no-memory', action='store_true', help="Não mede o pico de memória (mais rápido)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Resultados usados como referência")
+    parser.add_argument('--save-baseline', action='store_true', help="Grava os resultados como nova referência")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="Piora relativa tolerada (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    memory = not args.no_memory
+    results = {}
+
+    results['cold_start'] = bench_cold_start(args.model, args.vectorizer)
+    if args.app:
+        results['app_cold_start'] = bench_app_cold_start()
+    results['model_load'] = measure(lambda: ModelRegistry(args.model, args.vectorizer).get(), memory=memory)
+    loaded = ModelRegistry(args.model, args.vectorizer).get()
+    results['single_predict'] = bench_single_predict(loaded)
+
+    if args.compact_model:
+        def compact():
+            return ModelRegistry(args.model, args.vectorizer, compact_path=args.compact_model).get()
+
+        results['cold_start_compact'] = bench_cold_start(args.model, args.vectorizer, args.compact_model)
+        results['model_load_compact'] = measure(compact, memory=memory)
+        results['single_predict_compact'] = bench_single_predict(compact())
+
+    for label in args.sizes.split(','):
+        label = label.strip().lower()
+        if label not in SIZES:
+            raise SystemExit(f"Tamanho desconhecido: {label!r} (use {', '.join(SIZES)})")
+        results.update(bench_size(label, SIZES[label], loaded, memory, args.sheets_max_rows))
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'model_version': loaded.version,
+        'results': results,
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(result_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+
+    for stage, metrics in results.items():
+        print(f"{stage:28s} " + '  '.join(f"{metric}={value}" for metric, value in metrics.items()))
+    print(f"\nResultados gravados em {result_path}")
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = find_regressions(results, baseline, args.threshold)
+        for stage, metric, base, value, change in regressions:
+            print(f"REGRESSÃO {stage}.{metric}: {base} -> {value} ({change:+.1%})")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"Nenhuma regressão acima de {args.threshold:.0%} em relação a {args.baseline}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Linha de base gravada em {args.baseline}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
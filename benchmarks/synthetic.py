@@ -0,0 +1,43 @@
+import csv
+import random
+
+from csv_pipeline import COMMENT_COLUMN, CSV_OPTIONS
+
+POSITIVE = ['ótimo', 'excelente', 'adorei', 'maravilhoso', 'perfeito', 'recomendo', 'rápido', 'gostei',
+            'incrível', 'eficiente', 'atencioso', 'satisfeito']
+NEGATIVE = ['péssimo', 'horrível', 'demorado', 'ruim', 'quebrado', 'atrasado', 'decepcionante', 'caro',
+            'grosseiro', 'defeito', 'insatisfeito', 'nunca']
+NEUTRAL = ['produto', 'entrega', 'atendimento', 'pedido', 'loja', 'compra', 'site', 'caixa', 'cor',
+           'tamanho', 'prazo', 'embalagem']
+FILLERS = ['o', 'a', 'de', 'com', 'muito', 'foi', 'e', 'mas', 'para', 'que', 'não', 'bem']
+
+# Comentários repetidos com frequência, como nos feedbacks reais
+TEMPLATES = ['ótimo', 'péssimo atendimento', 'produto chegou no prazo', 'recomendo', 'não gostei',
+             'entrega atrasada', 'tudo certo', 'muito bom']
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+
+# Gera comentários em português de forma determinística (mesma semente, mesmos textos)
+def generate_comments(rows, seed=42, template_ratio=0.3):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        if rng.random() < template_ratio:
+            yield rng.choice(TEMPLATES)
+            continue
+        polarity = rng.choice([POSITIVE, NEGATIVE, NEUTRAL])
+        words = rng.choices(polarity, k=rng.randint(1, 3)) + rng.choices(NEUTRAL, k=rng.randint(1, 3))
+        words += rng.choices(FILLERS, k=rng.randint(1, 5))
+        rng.shuffle(words)
+        yield ' '.join(words)
+
+
+# Grava um CSV no mesmo padrão aceito pelo aplicativo (';' e ISO-8859-1)
+def write_csv(path, rows, seed=42):
+    with open(path, 'w', encoding=CSV_OPTIONS['encoding'], newline='') as file:
+        writer = csv.writer(file, delimiter=CSV_OPTIONS['sep'])
+        writer.writerow([COMMENT_COLUMN, 'Nota'])
+        rng = random.Random(seed + 1)
+        for comment in generate_comments(rows, seed):
+            writer.writerow([comment, rng.randint(1, 5)])
+    return path
@@ -0,0 +1,364 @@
+# Formato compacto do modelo Naive Bayes + vetorizador, lido com mmap.
+#
+# Exemplo (gera a pasta modelo_compacto/ e confere as previsões com os arquivos .pkl):
+#   python compact_model.py --model modelo_naive_bayes.pkl --vectorizer vectorizer.pkl
+#
+# O pickle do vetorizador guarda o vocabulário em um dict do Python, que é a maior parte
+# da memória e do tempo de carga, e cada processo do Streamlit mantém a sua cópia.
+# Aqui tudo vira arrays do NumPy gravados em .npy:
+#   vocabulary.npy        termos em UTF-8, ordenados (busca binária com searchsorted)
+#   feature_log_prob.npy  log-probabilidades (termos x classes), na ordem do vocabulário
+#   class_log_prior.npy   log-probabilidade a priori de cada classe
+#   idf.npy               pesos idf, apenas para TfidfVectorizer
+#   meta.json             classes, parâmetros do vetorizador e a versão do conteúdo
+# Cada versão fica em uma subpasta com o nome da versão, e o arquivo CURRENT indica a que está
+# em uso. Pastas antigas, com os arquivos direto em modelo_compacto/, continuam sendo aceitas.
+# Os arquivos são abertos com np.load(mmap_mode='r'), então todos os processos compartilham
+# as mesmas páginas do cache do sistema operacional.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+from scipy import sparse
+
+COMPACT_MODEL_PATH = 'modelo_compacto'
+
+META_FILE = 'meta.json'
+
+# Arquivo com o nome da subpasta da versão em uso
+CURRENT_FILE = 'CURRENT'
+
+# Versões mantidas em disco: a atual e a anterior, que processos ainda podem estar abrindo
+KEEP_VERSIONS = 2
+
+# Parâmetros do vetorizador necessários para reproduzir a tokenização
+ANALYZER_PARAMS = ('analyzer', 'lowercase', 'strip_accents', 'token_pattern', 'ngram_range', 'stop_words')
+TFIDF_PARAMS = ('norm', 'use_idf', 'sublinear_tf')
+
+# Quantidade de textos sintéticos (combinações de termos do vocabulário) da verificação de paridade
+PARITY_SAMPLE = 20000
+
+FORMAT_VERSION = 1
+
+
+# Pasta com os arquivos da versão em uso
+def resolve_compact_path(path=COMPACT_MODEL_PATH):
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding='utf-8') as file:
+            name = file.read().strip()
+    except OSError:
+        return path
+    return os.path.join(path, name) if name else path
+
+
+def has_compact_model(path=COMPACT_MODEL_PATH):
+    return os.path.isfile(os.path.join(resolve_compact_path(path), META_FILE))
+
+
+# Arquivos que compõem o modelo compacto (usados pelo registro para detectar alterações).
+# O CURRENT entra na lista para que a troca de versão mude a assinatura.
+def compact_artifact_paths(path):
+    current = resolve_compact_path(path)
+    with open(os.path.join(current, META_FILE), encoding='utf-8') as file:
+        arrays = json.load(file)['arrays']
+    paths = (os.path.join(current, META_FILE),) + tuple(os.path.join(current, f"{name}.npy") for name in arrays)
+    if current != path:
+        paths = (os.path.join(path, CURRENT_FILE),) + paths
+    return paths
+
+
+def _vectorizer_meta(vectorizer):
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+    if not isinstance(vectorizer, CountVectorizer):
+        raise ValueError(f"Vetorizador não suportado: {type(vectorizer).__name__}")
+    if callable(vectorizer.analyzer) or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        raise ValueError("Vetorizadores com funções personalizadas não podem ser exportados")
+
+    params = {name: getattr(vectorizer, name) for name in ANALYZER_PARAMS}
+    params['ngram_range'] = list(params['ngram_range'])
+    if params['stop_words'] is not None and not isinstance(params['stop_words'], str):
+        params['stop_words'] = sorted(params['stop_words'])
+    params['binary'] = bool(vectorizer.binary)
+    if isinstance(vectorizer, TfidfVectorizer):
+        params.update({name: getattr(vectorizer, name) for name in TFIDF_PARAMS})
+    return params
+
+
+def _model_meta(model):
+    from sklearn.naive_bayes import ComplementNB, MultinomialNB
+
+    # ComplementNB só soma a probabilidade a priori quando existe uma única classe
+    if isinstance(model, ComplementNB):
+        return {'add_class_prior': len(model.classes_) == 1}
+    if isinstance(model, MultinomialNB):
+        return {'add_class_prior': True}
+    raise ValueError(f"Modelo não suportado: {type(model).__name__}")
+
+
+# Converte o modelo e o vetorizador já treinados para o formato compacto, gravando em output_dir
+def export_compact_model(model, vectorizer, output_dir=COMPACT_MODEL_PATH, dtype='float32'):
+    dtype = np.dtype(dtype)
+    meta = {'format': FORMAT_VERSION, 'vectorizer': _vectorizer_meta(vectorizer), 'model': _model_meta(model)}
+    meta['classes'] = [cls.item() if hasattr(cls, 'item') else cls for cls in model.classes_]
+
+    # Vocabulário em ordem de bytes UTF-8, que é a ordem usada pelo searchsorted em arrays 'S'
+    terms = sorted((term.encode('utf-8'), column) for term, column in vectorizer.vocabulary_.items())
+    columns = np.array([column for _, column in terms], dtype=np.int64)
+    arrays = {
+        'vocabulary': np.array([term for term, _ in terms], dtype=np.bytes_),
+        # Termos nas linhas: o produto X @ feature_log_prob não precisa de cópia transposta
+        'feature_log_prob': np.ascontiguousarray(np.asarray(model.feature_log_prob_)[:, columns].T, dtype=dtype),
+        'class_log_prior': np.asarray(model.class_log_prior_, dtype=dtype),
+    }
+    if meta['vectorizer'].get('use_idf'):
+        arrays['idf'] = np.asarray(vectorizer.idf_, dtype=dtype)[columns]
+    meta['arrays'] = list(arrays)
+
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps(meta, sort_keys=True).encode('utf-8'))
+    for name, array in arrays.items():
+        digest.update(name.encode('utf-8'))
+        digest.update(array.tobytes())
+    meta['version'] = digest.hexdigest()
+
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f"{name}.npy"), array)
+    # meta.json por último: sem ele o registro não considera a pasta um modelo
+    with open(os.path.join(output_dir, META_FILE), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False, indent=2)
+    return meta
+
+
+# Coloca uma pasta já gravada (e conferida) em uso. A pasta vira a subpasta da sua versão e o
+# CURRENT é substituído com os.replace, então modelo_compacto/ sempre aponta para uma versão
+# completa: o registro nunca encontra a pasta vazia nem metade dos arquivos de cada versão.
+# Processos com os arquivos antigos mapeados continuam lendo-os até recarregar.
+def install_compact_model(staging_dir, output_dir=COMPACT_MODEL_PATH):
+    with open(os.path.join(staging_dir, META_FILE), encoding='utf-8') as file:
+        version = json.load(file)['version']
+    os.makedirs(output_dir, exist_ok=True)
+    version_dir = os.path.join(output_dir, version)
+    if os.path.isdir(version_dir):
+        # Mesmo conteúdo já instalado
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    else:
+        os.rename(staging_dir, version_dir)
+
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.CURRENT_')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(version)
+        os.replace(tmp_path, os.path.join(output_dir, CURRENT_FILE))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    _remove_old_versions(output_dir, version)
+
+
+# Apaga as versões além das KEEP_VERSIONS mais recentes e os arquivos do formato sem subpastas
+def _remove_old_versions(output_dir, current):
+    versions = []
+    for entry in os.scandir(output_dir):
+        if entry.is_dir() and entry.name != current and os.path.isfile(os.path.join(entry.path, META_FILE)):
+            versions.append((entry.stat().st_mtime, entry.path))
+        elif entry.is_file() and (entry.name == META_FILE or entry.name.endswith('.npy')):
+            os.unlink(entry.path)
+    versions.sort(reverse=True)
+    for _, path in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+# Substitui o vetorizador do scikit-learn: mesma tokenização, vocabulário em array ordenado
+class CompactVectorizer:
+
+    def __init__(self, meta, vocabulary, idf=None, dtype=np.float64):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        params = meta['vectorizer']
+        self.analyzer = params['analyzer']
+        self.lowercase = params['lowercase']
+        self.tokenizer = None
+        self.preprocessor = None
+        self.binary = params['binary']
+        self.norm = params.get('norm')
+        self.sublinear_tf = params.get('sublinear_tf', False)
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.dtype = dtype
+        # A tokenização é a do próprio scikit-learn, montada só com os parâmetros salvos
+        self._analyze = CountVectorizer(
+            analyzer=params['analyzer'],
+            lowercase=params['lowercase'],
+            strip_accents=params['strip_accents'],
+            token_pattern=params['token_pattern'],
+            ngram_range=tuple(params['ngram_range']),
+            stop_words=params['stop_words'],
+        ).build_analyzer()
+
+    def transform(self, raw_documents):
+        rows = []
+        terms = []
+        count = 0
+        for row, document in enumerate(raw_documents):
+            document_terms = self._analyze(document)
+            terms.extend(document_terms)
+            rows.extend([row] * len(document_terms))
+            count = row + 1
+
+        n_features = len(self.vocabulary)
+        columns = np.empty(0, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        if terms and n_features:
+            query = np.array([term.encode('utf-8') for term in terms], dtype=np.bytes_)
+            columns = np.minimum(np.searchsorted(self.vocabulary, query), n_features - 1)
+            found = self.vocabulary[columns] == query
+            rows, columns = rows[found], columns[found]
+        else:
+            rows = rows[:0]
+
+        # Termos repetidos em um mesmo texto são somados na conversão para CSR
+        X = sparse.coo_matrix((np.ones(len(rows), dtype=self.dtype), (rows, columns)),
+                              shape=(count, n_features)).tocsr()
+        X.sum_duplicates()
+        if self.binary:
+            X.data[:] = 1
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1
+        if self.idf is not None:
+            X = X @ sparse.diags(np.asarray(self.idf))
+        if self.norm:
+            from sklearn.preprocessing import normalize
+            X = normalize(X, norm=self.norm, copy=False)
+        return X
+
+
+# Substitui o MultinomialNB/ComplementNB: argmax de X @ log-probabilidades (+ a priori)
+class CompactNaiveBayes:
+
+    def __init__(self, meta, feature_log_prob, class_log_prior):
+        self.classes_ = np.array(meta['classes'])
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        self.add_class_prior = meta['model']['add_class_prior']
+
+    def joint_log_likelihood(self, X):
+        jll = np.asarray(X @ self.feature_log_prob)
+        if self.add_class_prior:
+            jll = jll + self.class_log_prior
+        return jll
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.joint_log_likelihood(X), axis=1)]
+
+
+# Abre o modelo compacto: (modelo, vetorizador, meta). Os arrays ficam mapeados, não copiados.
+def load_compact_model(path=COMPACT_MODEL_PATH):
+    path = resolve_compact_path(path)
+    with open(os.path.join(path, META_FILE), encoding='utf-8') as file:
+        meta = json.load(file)
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Formato de modelo compacto desconhecido: {meta.get('format')!r}")
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in meta['arrays']}
+    dtype = arrays['feature_log_prob'].dtype
+    vectorizer = CompactVectorizer(meta, arrays['vocabulary'], arrays.get('idf'), dtype=dtype)
+    model = CompactNaiveBayes(meta, arrays['feature_log_prob'], arrays['class_log_prior'])
+    return model, vectorizer, meta
+
+
+# Textos que exercitam todo o vocabulário: cada termo aparece ao menos uma vez
+def parity_texts(vocabulary, sample=PARITY_SAMPLE, seed=0):
+    terms = [term.decode('utf-8') for term in vocabulary]
+    rng = random.Random(seed)
+    shuffled = terms[:]
+    rng.shuffle(shuffled)
+    texts = [' '.join(shuffled[start:start + 8]) for start in range(0, len(shuffled), 8)]
+    for _ in range(sample):
+        texts.append(' '.join(rng.choices(terms, k=rng.randint(1, 30))))
+    return texts
+
+
+# Compara as previsões do formato compacto com as do par modelo/vetorizador original.
+# Retorna (quantidade de textos, índices com previsão diferente).
+def check_parity(model, vectorizer, compact_model, compact_vectorizer, texts):
+    reference = model.predict(vectorizer.transform(texts))
+    compact = compact_model.predict(compact_vectorizer.transform(texts))
+    mismatches = [index for index, (a, b) in enumerate(zip(reference, compact)) if str(a) != str(b)]
+    return len(texts), mismatches
+
+
+# Exporta para uma pasta temporária ao lado de output_dir e confere a paridade com o modelo
+# original. Retorna (pasta, meta, textos conferidos, índices divergentes); havendo divergências
+# a pasta já foi apagada e não deve ser instalada.
+def stage_compact_model(model, vectorizer, output_dir=COMPACT_MODEL_PATH, dtype='float32',
+                        extra_texts=(), sample=PARITY_SAMPLE):
+    output_dir = os.path.abspath(output_dir)
+    staging_dir = tempfile.mkdtemp(dir=os.path.dirname(output_dir), prefix='.modelo_compacto_')
+    try:
+        meta = export_compact_model(model, vectorizer, staging_dir, dtype)
+        compact_model, compact_vectorizer, _ = load_compact_model(staging_dir)
+        texts = parity_texts(compact_vectorizer.vocabulary, sample)
+        texts.extend(extra_texts)
+        _, mismatches = check_parity(model, vectorizer, compact_model, compact_vectorizer, texts)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    if mismatches:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return staging_dir, meta, texts, mismatches
+
+
+def main(argv=None):
+    from model_registry import MODEL_PATH, VECTORIZER_PATH, _load_artifact
+
+    parser = argparse.ArgumentParser(description="Exporta o modelo para o formato compacto lido com mmap.")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--vectorizer', default=VECTORIZER_PATH)
+    parser.add_argument('--output', default=COMPACT_MODEL_PATH, help="Pasta do modelo compacto")
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float64'],
+                        help="Precisão das log-probabilidades")
+    parser.add_argument('--texts', help="CSV/JSONL com comentários reais para a verificação de paridade")
+    parser.add_argument('--sample', type=int, default=PARITY_SAMPLE, help="Textos sintéticos da verificação")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    model = _load_artifact(args.model)
+    vectorizer = _load_artifact(args.vectorizer)
+
+    extra_texts = []
+    if args.texts:
+        from csv_pipeline import iter_comment_chunks
+        for chunk in iter_comment_chunks(args.texts):
+            extra_texts.extend(chunk)
+
+    # Gravado ao lado da pasta final e só instalado depois da verificação de paridade
+    staging_dir, meta, texts, mismatches = stage_compact_model(model, vectorizer, args.output, args.dtype,
+                                                               extra_texts, args.sample)
+    total = len(texts)
+    if mismatches:
+        print(f"PARIDADE FALHOU: {len(mismatches)} de {total} previsões diferentes "
+              f"(ex.: {texts[mismatches[0]][:80]!r}). Tente --dtype float64.")
+        return 1
+    try:
+        install_compact_model(staging_dir, os.path.abspath(args.output))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    print(f"Paridade conferida: {total} previsões idênticas às do modelo original")
+    print(f"Modelo compacto {meta['version']} gravado em {args.output} "
+          f"({len(vectorizer.vocabulary_)} termos, {args.dtype})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
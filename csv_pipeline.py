@@ -0,0 +1,303 @@
+import gzip
+import importlib.util
+import io
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+import pandas as pd
+
+from instrumentation import stage
+from model_registry import get_registry
+from prediction_cache import predict_cached
+from word_frequencies import count_words
+
+COMMENT_COLUMN = 'Comentário'
+SENTIMENT_COLUMN = 'Sentimento'
+
+# Quantidade de linhas lidas e classificadas por vez
+CSV_CHUNK_ROWS = 50000
+
+# Convenções dos arquivos exportados pelas nossas ferramentas
+CSV_OPTIONS = {'encoding': 'iso-8859-1', 'sep': ';', 'on_bad_lines': 'skip'}
+
+# Formatos de saída: extensão do arquivo e tipo MIME do download
+OUTPUT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# Parquet e Arrow dependem do pyarrow, que é opcional
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+StreamResult = namedtuple('StreamResult', ['rows', 'sentiment_counts', 'word_frequencies', 'output_path', 'seconds'])
+
+
+def _source_name(source):
+    return str(getattr(source, 'name', source)).lower()
+
+
+# Formato do arquivo pela extensão (arquivos enviados pelo Streamlit usam o atributo name).
+# Um .gz no final indica apenas a compressão: entrada.csv.gz é 'csv'.
+def detect_format(source):
+    name = _source_name(source)
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return 'jsonl'
+    if name.endswith('.parquet') or name.endswith('.pq'):
+        return 'parquet'
+    if name.endswith('.arrow') or name.endswith('.feather') or name.endswith('.ipc'):
+        return 'arrow'
+    return 'csv'
+
+
+# O pandas só deduz a compressão de caminhos; para arquivos enviados ela é informada explicitamente
+def detect_compression(source):
+    return 'gzip' if _source_name(source).endswith('.gz') else None
+
+
+# Formato de saída pela extensão do caminho (.parquet, .csv.gz ou CSV comum)
+def detect_output_format(path):
+    name = str(path).lower()
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith('.gz'):
+        return 'csv.gz'
+    return 'csv'
+
+
+def _import_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Arquivos Parquet/Arrow precisam do pacote pyarrow (pip install pyarrow)")
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    return pyarrow
+
+
+# Blocos de até chunk_rows linhas de uma coluna lida com o pyarrow
+def _iter_arrow_batches(batches, chunk_rows):
+    for batch in batches:
+        if COMMENT_COLUMN not in batch.schema.names:
+            raise ValueError(f"O arquivo não possui a coluna '{COMMENT_COLUMN}'")
+        column = batch.column(batch.schema.get_field_index(COMMENT_COLUMN))
+        for start in range(0, len(column), chunk_rows):
+            yield column.slice(start, chunk_rows).to_pandas()
+
+
+def _arrow_reader(source):
+    pa = _import_pyarrow()
+    # Caminhos em disco são mapeados em memória: a coluna é lida sem copiar o arquivo inteiro
+    if isinstance(source, str):
+        source = pa.memory_map(source)
+    try:
+        reader = pa.ipc.open_file(source)
+        return (reader.get_batch(index) for index in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        # Formato de fluxo (.arrows), sem o rodapé do formato de arquivo
+        source.seek(0)
+        return iter(pa.ipc.open_stream(source))
+
+
+# Lê apenas a coluna de comentários, em blocos de chunk_rows linhas.
+# CSV segue as convenções acima (com ou sem gzip); JSONL tem um objeto por linha com a chave
+# 'Comentário'; Parquet lê só a coluna pedida do disco e Arrow (IPC/Feather) é mapeado em memória.
+def iter_comment_chunks(source, chunk_rows=CSV_CHUNK_ROWS, file_format=None):
+    file_format = file_format or detect_format(source)
+    compression = detect_compression(source)
+    if file_format == 'parquet':
+        parquet_file = _import_pyarrow().parquet.ParquetFile(source)
+        if COMMENT_COLUMN not in parquet_file.schema_arrow.names:
+            raise ValueError(f"O arquivo não possui a coluna '{COMMENT_COLUMN}'")
+        batches = parquet_file.iter_batches(batch_size=chunk_rows, columns=[COMMENT_COLUMN])
+        for comments in _iter_arrow_batches(batches, chunk_rows):
+            yield comments.fillna('').astype(str)
+        return
+    if file_format == 'arrow':
+        for comments in _iter_arrow_batches(_arrow_reader(source), chunk_rows):
+            yield comments.fillna('').astype(str)
+        return
+
+    if file_format == 'jsonl':
+        reader = pd.read_json(source, lines=True, dtype=False, chunksize=chunk_rows, encoding='utf-8',
+                              compression=compression)
+    elif file_format == 'csv':
+        reader = pd.read_csv(source, usecols=[COMMENT_COLUMN], dtype=str, chunksize=chunk_rows,
+                             compression=compression, **CSV_OPTIONS)
+    else:
+        raise ValueError(f"Formato não suportado: {file_format!r}")
+    with reader:
+        for chunk in reader:
+            if COMMENT_COLUMN not in chunk:
+                raise ValueError(f"O arquivo não possui a coluna '{COMMENT_COLUMN}'")
+            yield chunk[COMMENT_COLUMN].fillna('').astype(str)
+
+
+# Lê o arquivo inteiro (todas as colunas), em qualquer um dos formatos aceitos.
+# rows limita a quantidade de linhas lidas (usado nas prévias).
+def read_table(source, file_format=None, rows=None):
+    file_format = file_format or detect_format(source)
+    if file_format == 'csv':
+        return pd.read_csv(source, nrows=rows, compression=detect_compression(source), **CSV_OPTIONS)
+    if file_format == 'jsonl':
+        return pd.read_json(source, lines=True, dtype=False, nrows=rows, encoding='utf-8',
+                            compression=detect_compression(source))
+    if file_format == 'parquet':
+        parquet_file = _import_pyarrow().parquet.ParquetFile(source)
+        if rows is None:
+            return parquet_file.read().to_pandas()
+        batch = next(parquet_file.iter_batches(batch_size=rows), None)
+        return (parquet_file.schema_arrow.empty_table() if batch is None else batch).to_pandas()
+    if file_format == 'arrow':
+        table = _import_pyarrow().Table.from_batches(list(_arrow_reader(source)))
+        return (table if rows is None else table.slice(0, rows)).to_pandas()
+    raise ValueError(f"Formato não suportado: {file_format!r}")
+
+
+# Lê um arquivo de resultados gravado por analyze_csv_stream (UTF-8 separado por vírgula, ou Parquet)
+def read_results(path, rows=None):
+    if detect_output_format(path) == 'parquet':
+        return read_table(path, 'parquet', rows)
+    return pd.read_csv(path, nrows=rows, dtype=str, keep_default_na=False)
+
+
+# Lê um arquivo de resultados em blocos de chunk_rows linhas
+def iter_result_chunks(path, chunk_rows=CSV_CHUNK_ROWS):
+    if detect_output_format(path) == 'parquet':
+        for batch in _import_pyarrow().parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    with pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+# Converte um arquivo de resultados para outro formato, bloco a bloco, em um arquivo temporário
+def convert_results(path, output_format, output_path=None, chunk_rows=CSV_CHUNK_ROWS):
+    if output_path is None:
+        suffix = OUTPUT_FORMATS[output_format][0]
+        with tempfile.NamedTemporaryFile(prefix='resultado_sentimentos_', suffix=suffix, delete=False) as tmp:
+            output_path = tmp.name
+    with ResultWriter(output_path, output_format) as output:
+        for chunk in iter_result_chunks(path, chunk_rows):
+            output.write(chunk)
+    return output_path
+
+
+# Grava os resultados bloco a bloco em CSV, CSV com gzip ou Parquet
+class ResultWriter:
+
+    def __init__(self, path, output_format='csv'):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de saída não suportado: {output_format!r}")
+        self.path = path
+        self.output_format = output_format
+        self._file = None
+        self._parquet = None
+        if output_format == 'csv':
+            self._file = open(path, 'w', encoding='utf-8', newline='')
+        elif output_format == 'csv.gz':
+            # Nível 6: quase o tamanho do nível 9 em bem menos tempo
+            self._file = gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+        else:
+            _import_pyarrow()
+        self._header = True
+
+    def write(self, frame):
+        if self._file is not None:
+            frame.to_csv(self._file, index=False, header=self._header)
+        else:
+            pa = _import_pyarrow()
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pa.parquet.ParquetWriter(self.path, table.schema, compression='zstd')
+            self._parquet.write_table(table)
+        self._header = False
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        elif self._parquet is not None:
+            self._parquet.close()
+        elif self.output_format == 'parquet':
+            # Nenhum bloco: grava um Parquet vazio com as colunas esperadas
+            pa = _import_pyarrow()
+            empty = pa.table({COMMENT_COLUMN: pa.array([], pa.string()), SENTIMENT_COLUMN: pa.array([], pa.string())})
+            pa.parquet.write_table(empty, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Serializa um DataFrame já em memória para download: bytes em um buffer, sem montar uma string gigante
+def export_frame(frame, output_format='csv'):
+    buffer = io.BytesIO()
+    if output_format == 'csv':
+        frame.to_csv(buffer, index=False, encoding='utf-8')
+    elif output_format == 'csv.gz':
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6) as compressed:
+            frame.to_csv(compressed, index=False, encoding='utf-8')
+    elif output_format == 'parquet':
+        _import_pyarrow()
+        frame.to_parquet(buffer, index=False, compression='zstd')
+    else:
+        raise ValueError(f"Formato de saída não suportado: {output_format!r}")
+    buffer.seek(0)
+    return buffer
+
+
+# Classifica uma série de comentários. Os vazios (ou só com espaços) não passam pelo modelo: ficam com o
+# sentimento em branco e são indicados por False em filled, para ficarem de fora das contagens.
+# Os demais argumentos vão para predict_cached.
+def predict_comments(comments, **kwargs):
+    filled = comments.str.strip() != ''
+    predictions = pd.Series('', index=comments.index, dtype=object)
+    predictions[filled] = predict_cached(comments[filled], **kwargs)
+    return predictions, filled
+
+
+# Classifica um arquivo bloco a bloco, sem nunca carregar o arquivo inteiro.
+# As previsões vão para output_path (ou um arquivo temporário) e o resultado traz apenas
+# os agregados: contagem por sentimento e frequência de palavras por sentimento, sem os comentários vazios.
+# progress(linhas, segundos) é chamado após cada bloco; workers > 1 classifica cada bloco em paralelo.
+# output_format ('csv', 'csv.gz' ou 'parquet') é deduzido da extensão de output_path quando omitido.
+def analyze_csv_stream(source, output_path=None, chunk_rows=CSV_CHUNK_ROWS, progress=None, loaded=None, workers=1,
+                       file_format=None, cache=None, output_format=None):
+    if loaded is None:
+        loaded = get_registry().get()
+    if output_format is None:
+        output_format = detect_output_format(output_path) if output_path else 'csv'
+    if output_path is None:
+        suffix = OUTPUT_FORMATS[output_format][0]
+        with tempfile.NamedTemporaryFile(prefix='resultado_sentimentos_', suffix=suffix, delete=False) as tmp:
+            output_path = tmp.name
+
+    start = time.perf_counter()
+    rows = 0
+    sentiment_counts = Counter()
+    word_frequencies = {}
+
+    with ResultWriter(output_path, output_format) as output:
+        chunks = iter_comment_chunks(source, chunk_rows, file_format)
+        while True:
+            with stage('read_csv') as medicao:
+                comments = next(chunks, None)
+                medicao.rows = 0 if comments is None else len(comments)
+            if comments is None:
+                break
+
+            predictions, filled = predict_comments(comments, loaded=loaded, cache=cache, workers=workers)
+            with stage('write_results', rows=len(comments)):
+                output.write(pd.DataFrame({COMMENT_COLUMN: comments, SENTIMENT_COLUMN: predictions}))
+
+            sentiment_counts.update(predictions[filled])
+            count_words(comments[filled], predictions[filled], word_frequencies)
+            rows += len(comments)
+            if progress is not None:
+                progress(rows, time.perf_counter() - start)
+
+    return StreamResult(rows, sentiment_counts, word_frequencies, output_path, time.perf_counter() - start)
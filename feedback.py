@@ -0,0 +1,254 @@
+# Feedback dos usuários e atualização incremental do modelo.
+#
+# Cada avaliação feita no app (comentário, sentimento previsto, sentimento correto e versão do
+# modelo) é gravada em um SQLite local. Quando há avaliações suficientes ainda não usadas, o
+# Naive Bayes é atualizado com partial_fit em mini-lotes, sem retreinar do zero, e publicado com
+# uma troca atômica do arquivo .pkl (e do modelo compacto, se estiver em uso). O registro de
+# modelos percebe a troca e recarrega sem bloquear quem está classificando.
+#
+# Exemplo (aplica as avaliações pendentes sem abrir o app):
+#   python feedback.py --update
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import joblib
+
+from model_registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_PATH = 'feedback.sqlite3'
+
+# Avaliações pendentes necessárias para disparar uma atualização automática
+UPDATE_MIN_FEEDBACK = 20
+
+# Avaliações por chamada de partial_fit
+MINI_BATCH_SIZE = 64
+
+
+class FeedbackStore:
+
+    def __init__(self, path=FEEDBACK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS feedback ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, comment TEXT NOT NULL,'
+                ' predicted TEXT NOT NULL, label TEXT NOT NULL, model_version TEXT NOT NULL)'
+            )
+            # Última avaliação já incorporada ao modelo
+            self._db.execute('CREATE TABLE IF NOT EXISTS training (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            self._db.commit()
+        return self._db
+
+    def add(self, comment, predicted, label, model_version):
+        with self._lock:
+            db = self._connect()
+            cursor = db.execute(
+                'INSERT INTO feedback (created_at, comment, predicted, label, model_version) VALUES (?, ?, ?, ?, ?)',
+                (time.time(), comment, predicted, label, model_version),
+            )
+            db.commit()
+            return cursor.lastrowid
+
+    def trained_until(self):
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM training WHERE key = 'trained_until'").fetchone()
+        return row[0] if row else 0
+
+    def mark_trained(self, feedback_id):
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO training (key, value) VALUES ('trained_until', ?)", (feedback_id,))
+            db.commit()
+
+    # Avaliações ainda não usadas no treino: [(id, comentário, sentimento correto), ...]
+    # after substitui a marca gravada aqui (ex.: a marca guardada no próprio modelo)
+    def pending(self, limit=None, after=None):
+        query = 'SELECT id, comment, label FROM feedback WHERE id > ? ORDER BY id'
+        params = (self.trained_until() if after is None else after,)
+        if limit:
+            query += ' LIMIT ?'
+            params += (limit,)
+        with self._lock:
+            return self._connect().execute(query, params).fetchall()
+
+    def pending_count(self):
+        trained_until = self.trained_until()
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM feedback WHERE id > ?', (trained_until,)).fetchone()[0]
+
+    # Acurácia observada pelos usuários em cada versão do modelo
+    def accuracy_by_version(self):
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT model_version, COUNT(*), SUM(predicted = label), MIN(created_at), MAX(created_at)'
+                ' FROM feedback GROUP BY model_version ORDER BY MIN(created_at)'
+            ).fetchall()
+        return [
+            {'version': version, 'feedback': total, 'correct': correct, 'accuracy': correct / total,
+             'first_at': first_at, 'last_at': last_at}
+            for version, total, correct, first_at, last_at in rows
+        ]
+
+
+# Grava em um arquivo temporário na mesma pasta e troca de uma vez (os.replace é atômico)
+def _publish_artifact(obj, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.modelo_', suffix='.pkl')
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Aplica as avaliações pendentes ao modelo com partial_fit e publica a nova versão.
+# O vocabulário do vetorizador não muda: palavras nunca vistas no treino continuam sendo ignoradas.
+# Retorna a quantidade de avaliações incorporadas.
+#
+# A última avaliação incorporada fica gravada no próprio modelo publicado (trained_until_), na
+# mesma troca atômica do arquivo. A marca do banco é só uma cópia para a contagem de pendentes:
+# uma queda entre a publicação e mark_trained, ou duas atualizações ao mesmo tempo (app e linha
+# de comando), nunca aplicam a mesma avaliação duas vezes ao modelo.
+def update_model(store, registry=None, batch_size=MINI_BATCH_SIZE, min_feedback=1):
+    registry = registry or get_registry()
+
+    # Cópia em memória (sem mmap): o modelo em uso continua intacto até a troca dos arquivos
+    model = joblib.load(registry.model_path)
+    # Modelos publicados antes da marca no arquivo seguem a marca do banco
+    trained_until = getattr(model, 'trained_until_', None)
+    if trained_until is None:
+        trained_until = store.trained_until()
+    elif trained_until != store.trained_until():
+        store.mark_trained(trained_until)
+
+    pending = store.pending(after=trained_until)
+    if not pending or len(pending) < min_feedback:
+        return 0
+
+    vectorizer = joblib.load(registry.vectorizer_path)
+    if not hasattr(model, 'partial_fit'):
+        raise ValueError(f"O modelo {type(model).__name__} não suporta atualização incremental")
+
+    # Rótulos fora das classes do modelo são ignorados (partial_fit não aceita classes novas)
+    classes = set(str(cls) for cls in model.classes_)
+    examples = [(comment, label) for _, comment, label in pending if label in classes]
+    for start in range(0, len(examples), batch_size):
+        batch = examples[start:start + batch_size]
+        model.partial_fit(vectorizer.transform([comment for comment, _ in batch]), [label for _, label in batch],
+                          classes=model.classes_)
+    model.trained_until_ = pending[-1][0]
+
+    # O modelo compacto é gerado e conferido antes de publicar qualquer arquivo: se a paridade
+    # falhar, nem o .pkl nem o compacto mudam e as avaliações continuam pendentes
+    staging_dir = None
+    if registry.using_compact():
+        from compact_model import install_compact_model, load_compact_model, stage_compact_model
+
+        # Mantém a precisão escolhida na exportação original
+        _, compact_vectorizer, _ = load_compact_model(registry.compact_path)
+        staging_dir, _, texts, mismatches = stage_compact_model(
+            model, vectorizer, registry.compact_path, compact_vectorizer.dtype,
+            extra_texts=[comment for comment, _ in examples])
+        if mismatches:
+            raise ValueError(f"Modelo compacto diverge do original em {len(mismatches)} de {len(texts)} "
+                             f"previsões; exporte novamente com compact_model.py --dtype float64")
+
+    try:
+        _publish_artifact(model, registry.model_path)
+        if staging_dir:
+            install_compact_model(staging_dir, os.path.abspath(registry.compact_path))
+    except BaseException:
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    store.mark_trained(pending[-1][0])
+    logger.info("Modelo atualizado com %d avaliações (%d ignoradas)", len(examples), len(pending) - len(examples))
+    return len(examples)
+
+
+# Registro das avaliações feitas no app, com atualização automática em segundo plano
+class FeedbackLearner:
+
+    def __init__(self, store=None, min_feedback=UPDATE_MIN_FEEDBACK):
+        self.store = store or FeedbackStore()
+        self.min_feedback = min_feedback
+        self._updating = threading.Lock()
+        self.last_error = None
+
+    def record(self, comment, predicted, label, model_version):
+        feedback_id = self.store.add(comment, predicted, label, model_version)
+        if self.store.pending_count() >= self.min_feedback:
+            self.update_in_background()
+        return feedback_id
+
+    # Uma atualização por vez; quem chega enquanto outra roda não espera
+    def update_in_background(self):
+        if not self._updating.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._update, daemon=True, name='feedback-update').start()
+        return True
+
+    def _update(self):
+        try:
+            update_model(self.store, min_feedback=self.min_feedback)
+            self.last_error = None
+        except Exception as error:
+            logger.exception("Falha ao atualizar o modelo com as avaliações")
+            self.last_error = error
+        finally:
+            self._updating.release()
+
+    @property
+    def updating(self):
+        return self._updating.locked()
+
+
+# Instância única por processo (o Streamlit reexecuta o app.py, mas este módulo permanece carregado)
+_learner = None
+_learner_lock = threading.Lock()
+
+
+def get_feedback_learner():
+    global _learner
+    if _learner is None:
+        with _learner_lock:
+            if _learner is None:
+                _learner = FeedbackLearner()
+    return _learner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avaliações dos usuários e atualização incremental do modelo.")
+    parser.add_argument('--feedback', default=FEEDBACK_PATH, help="Banco SQLite com as avaliações")
+    parser.add_argument('--update', action='store_true', help="Aplica as avaliações pendentes ao modelo")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    store = FeedbackStore(args.feedback)
+    if args.update:
+        print(f"{update_model(store)} avaliações incorporadas ao modelo")
+    print(f"{store.pending_count()} avaliações pendentes")
+    for item in store.accuracy_by_version():
+        print(f"{item['version']}: {item['accuracy']:.1%} de acerto em {item['feedback']} avaliações")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
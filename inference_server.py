@@ -0,0 +1,329 @@
+# Serviço HTTP local para classificar comentários, sem Streamlit.
+#
+# Exemplo:
+#   python inference_server.py --port 8080
+#   curl -X POST localhost:8080/predict -d '{"text": "Adorei o produto"}'
+#
+# Requisições simultâneas são agrupadas (micro-batching) e classificadas em uma única chamada
+# de transform/predict. Quando a fila enche o serviço responde 503 em vez de acumular trabalho.
+#
+# Rotas:
+#   POST /predict  {"text": "..."} -> {"sentiment": "..."}
+#                  {"texts": [...]} -> {"sentiments": [...]}
+#   GET  /metrics  latência p50/p99, tamanho dos lotes e tamanho da fila
+#   GET  /health
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, deque
+
+from instrumentation import METRICS_PATH, configure_metrics
+from model_registry import get_registry
+from prediction_cache import DISK_CACHE_PATH, enable_disk_cache, predict_cached
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo de um lote enviado ao modelo
+MAX_BATCH_SIZE = 256
+
+# Tempo máximo (em milissegundos) que o primeiro pedido de um lote espera por companhia
+MAX_WAIT_MS = 5.0
+
+# Pedidos aguardando classificação; acima disso o serviço responde 503
+MAX_QUEUE_SIZE = 10000
+
+# Quantidade de amostras usadas no cálculo dos percentis
+METRICS_WINDOW = 10000
+
+# Maior corpo de requisição aceito
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class ServiceMetrics:
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.batch_histogram = Counter()
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def snapshot(self, queue_size):
+        latencies_ms = [latency * 1000 for latency in self.latencies]
+        return {
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'queue_size': queue_size,
+            'latency_ms': {'p50': percentile(latencies_ms, 0.50), 'p99': percentile(latencies_ms, 0.99)},
+            'batch_size': {
+                'p50': percentile(self.batch_sizes, 0.50),
+                'p99': percentile(self.batch_sizes, 0.99),
+                'mean': sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else None,
+                'histogram': dict(sorted(self.batch_histogram.items())),
+            },
+        }
+
+
+# Executado em uma thread: uma única chamada de transform/predict para o lote inteiro
+def classify(texts):
+    return predict_cached(texts, loaded=get_registry().get())
+
+
+class QueueFull(Exception):
+    pass
+
+
+# Pedido com mais textos do que a fila inteira comporta: nunca seria aceito, nem repetido
+class TooManyTexts(Exception):
+    pass
+
+
+# Agrupa pedidos concorrentes em lotes.
+# A espera é adaptativa: com pouca carga (último lote com um único pedido) o lote sai na hora,
+# sem latência extra; quando há concorrência o primeiro pedido espera até max_wait_ms por outros.
+class MicroBatcher:
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 max_queue_size=MAX_QUEUE_SIZE, metrics=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.metrics = metrics or ServiceMetrics()
+        self._last_batch_size = 1
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, texts):
+        loop = asyncio.get_running_loop()
+        futures = []
+        if self.queue.maxsize and len(texts) > self.queue.maxsize:
+            self.metrics.rejected += 1
+            raise TooManyTexts()
+        # Todos os textos do pedido entram na fila, ou nenhum
+        if self.queue.maxsize and self.queue.qsize() + len(texts) > self.queue.maxsize:
+            self.metrics.rejected += 1
+            raise QueueFull()
+        for text in texts:
+            future = loop.create_future()
+            self.queue.put_nowait((text, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + (self.max_wait if self._last_batch_size > 1 else 0)
+        while len(batch) < self.max_batch_size:
+            # O que já está na fila entra no lote sem espera
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self._last_batch_size = len(batch)
+            self.metrics.batch_sizes.append(len(batch))
+            self.metrics.batch_histogram[len(batch)] += 1
+
+            texts = [text for text, _ in batch]
+            try:
+                # O modelo roda fora do loop para não bloquear a leitura de novos pedidos
+                predictions = await loop.run_in_executor(None, classify, texts)
+            except Exception as error:
+                logger.exception("Falha ao classificar um lote de %d textos", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+async def write_response(writer, status, payload, keep_alive, extra_headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        'Content-Type: application/json; charset=utf-8',
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        *extra_headers,
+    ]
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+
+class InferenceServer:
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.metrics = batcher.metrics
+
+    async def handle_predict(self, body):
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'JSON inválido'}
+        if not isinstance(payload, dict):
+            return 400, {'error': 'O corpo deve ser um objeto JSON'}
+        # Sem conversão com str(): {"text": null} seria classificado como o texto "None"
+        if 'texts' in payload:
+            texts = payload['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                return 400, {'error': "'texts' deve ser uma lista de strings"}
+            single = False
+        elif 'text' in payload:
+            if not isinstance(payload['text'], str):
+                return 400, {'error': "'text' deve ser uma string"}
+            texts = [payload['text']]
+            single = True
+        else:
+            return 400, {'error': "Informe 'text' ou 'texts'"}
+
+        start = time.perf_counter()
+        predictions = await self.batcher.predict(texts)
+        self.metrics.latencies.append(time.perf_counter() - start)
+        if single:
+            return 200, {'sentiment': predictions[0]}
+        return 200, {'sentiments': predictions}
+
+    async def handle_request(self, method, path, body):
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}
+            return await self.handle_predict(body)
+        if path == '/metrics' and method == 'GET':
+            return 200, self.metrics.snapshot(self.batcher.queue.qsize())
+        if path == '/health' and method == 'GET':
+            return 200, {'status': 'ok', 'model_version': get_registry().get().version}
+        return 404, {'error': 'Rota não encontrada'}
+
+    # Uma conexão pode enviar vários pedidos em sequência (keep-alive)
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await write_response(writer, 400, {'error': 'Requisição inválida'}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await write_response(writer, 400, {'error': 'Content-Length inválido'}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await write_response(writer, 413, {'error': 'Corpo muito grande'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                self.metrics.requests += 1
+                extra_headers = ()
+                try:
+                    status, payload = await self.handle_request(method, target.split('?')[0], body)
+                except TooManyTexts:
+                    status, payload = 413, {'error': f"Envie no máximo {self.batcher.queue.maxsize} textos por pedido"}
+                except QueueFull:
+                    status, payload = 503, {'error': 'Fila cheia, tente novamente'}
+                    extra_headers = ('Retry-After: 1',)
+                except Exception:
+                    logger.exception("Erro ao atender %s %s", method, target)
+                    self.metrics.errors += 1
+                    status, payload = 500, {'error': 'Erro interno'}
+                await write_response(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_queue_size=MAX_QUEUE_SIZE):
+    # Carrega o modelo antes de aceitar conexões
+    loaded = get_registry().get()
+    batcher = MicroBatcher(max_batch_size, max_wait_ms, max_queue_size)
+    batcher.start()
+    server = await asyncio.start_server(InferenceServer(batcher).handle_connection, host, port)
+    logger.info("Modelo %s servindo em http://%s:%d", loaded.version, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de análise de sentimento com micro-batching.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE, help="Tamanho máximo do lote")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS, help="Espera máxima para formar um lote")
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE_SIZE, help="Pedidos em espera antes de responder 503")
+    parser.add_argument('--disk-cache', nargs='?', const=DISK_CACHE_PATH, metavar='ARQUIVO',
+                        help=f"Guarda as previsões também em SQLite, entre reinícios (padrão: {DISK_CACHE_PATH})")
+    parser.add_argument('--metrics-path', default=METRICS_PATH,
+                        help="Arquivo de métricas do Prometheus ({process} vira o nome do script; '' desativa)")
+    args = parser.parse_args(argv)
+    configure_metrics(args.metrics_path)
+    if args.disk_cache:
+        enable_disk_cache(args.disk_cache)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms, args.max_queue))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Processo do pool de classificação em paralelo (parallel_inference.py).
+#
+# É iniciado como script (python inference_worker.py) e não pelo multiprocessing: com spawn ou
+# forkserver o processo filho reexecuta o módulo __main__ do pai, que no Streamlit é o app.py
+# inteiro. Aqui o processo só importa o necessário para carregar o modelo e classificar.
+#
+# A conversa com o processo pai usa objetos pickle em stdin/stdout:
+#   pai -> (model_path, vectorizer_path, compact_path)    uma vez, na partida
+#   pai <- ('ok', versão do modelo) ou ('erro', traceback)
+#   pai -> [textos]                                       quantas vezes for preciso
+#   pai <- ('ok', (versão, previsões, medições)) ou ('erro', traceback)
+# O processo termina quando o pai fecha o stdin.
+import os
+import pickle
+import sys
+import traceback
+
+
+def main():
+    # O stdout é o canal com o processo pai; qualquer outra saída (inclusive de bibliotecas em C)
+    # vai para o stderr
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    channel_in = sys.stdin.buffer
+
+    def reply(status, value):
+        pickle.dump((status, value), channel_out, protocol=pickle.HIGHEST_PROTOCOL)
+        channel_out.flush()
+
+    try:
+        from instrumentation import get_stage_metrics
+        from model_registry import ModelRegistry, predict_sentiments
+
+        # As medições vão para o pai junto com as previsões, em vez de sobrescrever o arquivo de métricas dele
+        get_stage_metrics().forward_to_parent()
+        model_path, vectorizer_path, compact_path = pickle.load(channel_in)
+        loaded = ModelRegistry(model_path, vectorizer_path, compact_path=compact_path).get()
+    except Exception:
+        reply('erro', traceback.format_exc())
+        return 1
+    reply('ok', loaded.version)
+
+    while True:
+        try:
+            texts = pickle.load(channel_in)
+        except EOFError:
+            return 0
+        try:
+            predictions = predict_sentiments(texts, loaded=loaded)
+            reply('ok', (loaded.version, predictions, get_stage_metrics().take_forwarded()))
+        except Exception:
+            reply('erro', traceback.format_exc())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger('sentimento.stages')
+
+# Arquivo no formato texto do Prometheus, regravado após as etapas medidas. {process} vira o nome do
+# script em execução (app, inference_server, batch_cli...), para que o app, o serviço e os lotes
+# não sobrescrevam o arquivo uns dos outros. A variável de ambiente substitui o padrão ('' desativa)
+METRICS_PATH = os.environ.get('SENTIMENTO_METRICS_PATH', 'metrics-{process}.prom')
+
+# Intervalo mínimo (em segundos) entre duas gravações do arquivo de métricas
+METRICS_WRITE_INTERVAL = 1.0
+
+# Nome do handler instalado por log_stages()
+STAGE_LOG_HANDLER = 'sentimento.stages'
+
+# Quantidade de medições individuais mantidas para o painel de diagnóstico
+RECENT_RECORDS = 200
+
+
+# Nome usado em {process}: o script principal (o Streamlit também o coloca em sys.argv[0]) ou,
+# quando não há um (python -c, console interativo), o pid
+def process_name():
+    script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ''))[0]
+    if not script or script.startswith('-') or script == '__main__':
+        return str(os.getpid())
+    return script
+
+
+def resolve_metrics_path(path=METRICS_PATH, process=None):
+    if not path:
+        return None
+    return path.replace('{process}', process or process_name())
+
+
+# Memória residente do processo. No Linux lê /proc; nos demais sistemas usa o pico
+# informado pelo resource (aproximação suficiente para comparar antes/depois de uma etapa).
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+# Medição em andamento; rows pode ser preenchido dentro do bloco
+class StageRecord:
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.seconds = 0.0
+        self.memory_delta = 0
+        self.started_at = time.time()
+        self.error = None
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 6),
+            'rows': self.rows,
+            'memory_delta_bytes': self.memory_delta,
+            'started_at': self.started_at,
+            'error': self.error,
+        }
+
+
+class StageMetrics:
+
+    def __init__(self, metrics_path=None, recent=RECENT_RECORDS):
+        self.metrics_path = metrics_path
+        self.recent = deque(maxlen=recent)
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        # Medições a devolver ao processo principal (apenas nos processos do pool)
+        self._outbox = None
+
+    def record(self, record):
+        with self._lock:
+            self.recent.append(record.as_dict())
+            totals = self.totals.setdefault(record.name, {
+                'calls': 0, 'errors': 0, 'seconds': 0.0, 'rows': 0, 'max_seconds': 0.0,
+                'last_seconds': 0.0, 'last_memory_delta_bytes': 0,
+            })
+            totals['calls'] += 1
+            totals['errors'] += record.error is not None
+            totals['seconds'] += record.seconds
+            totals['rows'] += record.rows or 0
+            totals['max_seconds'] = max(totals['max_seconds'], record.seconds)
+            totals['last_seconds'] = record.seconds
+            totals['last_memory_delta_bytes'] = record.memory_delta
+            if self._outbox is not None:
+                self._outbox.append(record)
+            # Etapas muito frequentes (ex.: o serviço HTTP) não regravam o arquivo a cada chamada
+            if self.metrics_path and time.monotonic() - self._last_write >= METRICS_WRITE_INTERVAL:
+                self._write_metrics()
+        # Log estruturado: uma linha JSON por etapa
+        logger.info(json.dumps(record.as_dict(), ensure_ascii=False))
+
+    def set_metrics_path(self, path):
+        with self._lock:
+            self.metrics_path = path
+            self._last_write = 0.0
+
+    # Usado nos processos do pool de inferência: quem grava o arquivo é o processo principal
+    # (senão cada processo o sobrescreveria com os próprios totais), e as medições ficam guardadas
+    # para voltarem junto com as previsões e serem somadas lá com record()
+    def forward_to_parent(self):
+        with self._lock:
+            self.metrics_path = None
+            self._outbox = []
+
+    def take_forwarded(self):
+        with self._lock:
+            records = self._outbox or []
+            if self._outbox is not None:
+                self._outbox = []
+        return records
+
+    def summary(self):
+        with self._lock:
+            return {name: dict(values) for name, values in self.totals.items()}
+
+    def prometheus_text(self):
+        lines = []
+        metrics = [
+            ('sentimento_stage_calls_total', 'counter', 'Execuções da etapa', 'calls'),
+            ('sentimento_stage_errors_total', 'counter', 'Execuções da etapa que falharam', 'errors'),
+            ('sentimento_stage_seconds_total', 'counter', 'Tempo total gasto na etapa', 'seconds'),
+            ('sentimento_stage_rows_total', 'counter', 'Linhas processadas pela etapa', 'rows'),
+            ('sentimento_stage_max_seconds', 'gauge', 'Maior duração observada da etapa', 'max_seconds'),
+            ('sentimento_stage_last_seconds', 'gauge', 'Duração da última execução da etapa', 'last_seconds'),
+            ('sentimento_stage_last_memory_delta_bytes', 'gauge',
+             'Variação de memória residente na última execução da etapa', 'last_memory_delta_bytes'),
+        ]
+        for metric, kind, description, key in metrics:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, values in sorted(self.totals.items()):
+                lines.append(f'{metric}{{stage="{name}"}} {values[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        with self._lock:
+            if self.metrics_path:
+                self._write_metrics()
+
+    # Gravação atômica, para que o coletor nunca leia um arquivo pela metade
+    def _write_metrics(self):
+        self._last_write = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(self.metrics_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics_', suffix='.prom')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(self.prometheus_text())
+            os.replace(tmp_path, self.metrics_path)
+        except OSError:
+            logger.warning("Não foi possível gravar %s", self.metrics_path, exc_info=True)
+
+
+_metrics = StageMetrics(resolve_metrics_path())
+
+
+def get_stage_metrics():
+    return _metrics
+
+
+# Troca o arquivo de métricas deste processo (ex.: --metrics-path na linha de comando); None desativa
+def configure_metrics(path=METRICS_PATH, process=None):
+    _metrics.set_metrics_path(resolve_metrics_path(path, process))
+
+
+# Mostra os logs JSON das etapas em stderr. Sem isto eles se perdem quando o logger raiz não tem
+# handler (como no streamlit run). O handler tem nome para não ser duplicado quando o Streamlit
+# reexecuta o script; enabled=False volta a esconder as linhas de INFO
+def log_stages(enabled=True, stream=None):
+    if enabled:
+        if not any(handler.get_name() == STAGE_LOG_HANDLER for handler in logger.handlers):
+            handler = logging.StreamHandler(stream or sys.stderr)
+            handler.set_name(STAGE_LOG_HANDLER)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        # Já há um handler próprio: sem isto a linha sairia de novo pelo logger raiz
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+    else:
+        for handler in [handler for handler in logger.handlers if handler.get_name() == STAGE_LOG_HANDLER]:
+            logger.removeHandler(handler)
+        logger.propagate = True
+        logger.setLevel(logging.WARNING)
+
+
+# Mede uma etapa: tempo de parede, linhas processadas e variação de memória residente.
+#
+#   with stage('read_csv') as medicao:
+#       data = pd.read_csv(...)
+#       medicao.rows = len(data)
+@contextmanager
+def stage(name, rows=None):
+    record = StageRecord(name, rows)
+    memory_before = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as error:
+        record.error = type(error).__name__
+        raise
+    finally:
+        record.seconds = time.perf_counter() - start
+        record.memory_delta = rss_bytes() - memory_before
+        _metrics.record(record)
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import warnings
+from collections import namedtuple
+
+import joblib
+
+from compact_model import COMPACT_MODEL_PATH, compact_artifact_paths, has_compact_model, load_compact_model
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = 'modelo_naive_bayes.pkl'
+VECTORIZER_PATH = 'vectorizer.pkl'
+
+# Intervalo mínimo (em segundos) entre duas verificações dos arquivos em disco
+CHECK_INTERVAL = 2.0
+
+# Quantidade máxima de textos por chamada de transform/predict
+PREDICT_CHUNK_SIZE = 50000
+
+# Conjunto imutável com o modelo carregado. Uma nova versão substitui a tupla inteira,
+# então quem já pegou uma referência continua usando um par modelo/vetorizador consistente.
+# artifact_bytes é o tamanho dos arquivos carregados: a variação de memória residente durante a
+# carga incluiria as importações do sklearn/numpy e não diz quanto o modelo ocupa
+LoadedModel = namedtuple(
+    'LoadedModel',
+    ['model', 'vectorizer', 'version', 'load_seconds', 'artifact_bytes', 'loaded_at', 'paths'],
+)
+
+
+# Identifica os arquivos em disco sem precisar lê-los (usado para detectar alterações)
+def _file_signature(paths):
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+# Hash do conteúdo dos artefatos, usado como versão do modelo
+def _content_version(paths):
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+# joblib só consegue mapear em memória arquivos salvos sem compressão.
+# Nos demais casos ele emite um aviso e carrega normalmente, o que é aceitável aqui.
+def _load_artifact(path):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        return joblib.load(path, mmap_mode='r')
+
+
+class ModelRegistry:
+
+    def __init__(self, model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH,
+                 check_interval=CHECK_INTERVAL, compact_path=None):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.compact_path = compact_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._signature = None
+        self._last_check = 0.0
+        self.reloads = 0
+
+    @property
+    def paths(self):
+        return (self.model_path, self.vectorizer_path, self.compact_path)
+
+    # O modelo compacto (compact_model.py), quando existe, tem prioridade sobre os arquivos .pkl
+    def using_compact(self):
+        return bool(self.compact_path) and has_compact_model(self.compact_path)
+
+    def _artifact_paths(self):
+        if self.using_compact():
+            return compact_artifact_paths(self.compact_path)
+        return (self.model_path, self.vectorizer_path)
+
+    # Retorna o modelo atual, recarregando-o se os arquivos mudaram em disco
+    def get(self):
+        current = self._current
+        now = time.monotonic()
+        if current is not None and now - self._last_check < self.check_interval:
+            return current
+
+        # Enquanto outra thread recarrega o modelo, as demais seguem com a versão atual
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            if self._current is not None and now - self._last_check < self.check_interval:
+                return self._current
+            self._last_check = now
+            try:
+                signature = _file_signature(self._artifact_paths())
+            except OSError:
+                if self._current is None:
+                    raise
+                logger.warning("Arquivos do modelo indisponíveis, mantendo a versão %s", self._current.version)
+                return self._current
+
+            if signature != self._signature:
+                self._reload(signature)
+            return self._current
+        finally:
+            self._lock.release()
+
+    def _reload(self, signature):
+        try:
+            if self.using_compact():
+                # Arrays mapeados com mmap: a versão já vem calculada no meta.json
+                with stage('compact_load') as medicao:
+                    model, vectorizer, meta = load_compact_model(self.compact_path)
+                    version = meta['version']
+            else:
+                with stage('joblib_load') as medicao:
+                    model = _load_artifact(self.model_path)
+                    vectorizer = _load_artifact(self.vectorizer_path)
+                    version = _content_version((self.model_path, self.vectorizer_path))
+        except Exception:
+            # Um arquivo sendo sobrescrito pode estar incompleto; a versão anterior continua valendo
+            if self._current is None:
+                raise
+            logger.exception("Falha ao recarregar o modelo, mantendo a versão %s", self._current.version)
+            return
+        load_seconds = medicao.seconds
+        artifact_bytes = sum(size for _, size in signature)
+
+        # Troca atômica: uma única atribuição da tupla nova
+        self._current = LoadedModel(model, vectorizer, version, load_seconds, artifact_bytes, time.time(), self.paths)
+        self._signature = signature
+        self.reloads += 1
+        logger.info("Modelo %s carregado em %.3fs (artefatos de %.1f MB)", version, load_seconds,
+                    artifact_bytes / 1e6)
+
+    # Estatísticas do modelo atualmente em uso
+    def stats(self):
+        current = self.get()
+        return {
+            'version': current.version,
+            'load_seconds': current.load_seconds,
+            'artifact_bytes': current.artifact_bytes,
+            'loaded_at': current.loaded_at,
+            'reloads': self.reloads,
+        }
+
+
+# Registro único por processo: o Streamlit reexecuta o app.py a cada interação,
+# mas os módulos importados (e este objeto) permanecem carregados entre as sessões.
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(compact_path=COMPACT_MODEL_PATH)
+    return _registry
+
+
+# Classifica vários textos de uma vez com uma única versão do modelo, em blocos de tamanho fixo
+def predict_sentiments(texts, loaded=None, chunk_size=PREDICT_CHUNK_SIZE):
+    if loaded is None:
+        loaded = get_registry().get()
+    texts = list(texts)
+    predictions = []
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts[start:start + chunk_size]
+        with stage('vectorize', rows=len(chunk)):
+            comentarios_vec = loaded.vectorizer.transform(chunk)
+        with stage('predict', rows=len(chunk)):
+            predictions.extend(str(pred) for pred in loaded.model.predict(comentarios_vec))
+    return predictions
@@ -0,0 +1,182 @@
+import os
+import pickle
+import subprocess
+import sys
+import threading
+
+from instrumentation import get_stage_metrics
+from model_registry import get_registry, predict_sentiments
+
+# Quantidade de processos usada quando nada é informado
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Menor quantidade de textos que compensa enviar a um processo: abaixo disso, copiar os textos
+# e as previsões entre processos custa mais do que classificá-los no próprio processo
+MIN_SHARD_TEXTS = 2000
+
+# Script executado por cada processo do pool (ver o protocolo em inference_worker.py)
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inference_worker.py')
+
+# Segundos de espera pelo fim de um processo do pool antes de encerrá-lo à força
+WORKER_EXIT_TIMEOUT = 5
+
+
+# Um processo do pool. Ele começa a carregar o modelo assim que é criado; ready() espera a carga.
+class _Worker:
+
+    def __init__(self, paths):
+        self.process = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        self.version = None
+        self.send(tuple(paths))
+
+    def send(self, value):
+        try:
+            pickle.dump(value, self.process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+            self.process.stdin.flush()
+        except OSError as error:
+            raise RuntimeError(f"Processo de classificação encerrado (código {self.process.poll()})") from error
+
+    def receive(self):
+        try:
+            status, value = pickle.load(self.process.stdout)
+        except EOFError:
+            raise RuntimeError(f"Processo de classificação encerrado (código {self.process.wait()})") from None
+        if status != 'ok':
+            raise RuntimeError(f"Falha no processo de classificação:\n{value}")
+        return value
+
+    def ready(self):
+        self.version = self.receive()
+        return self
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(WORKER_EXIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+# Divide os textos em até workers fatias de tamanhos iguais, cada uma com pelo menos
+# MIN_SHARD_TEXTS textos (uma fatia só: melhor classificar no próprio processo)
+def split_shards(texts, workers, min_shard_texts=MIN_SHARD_TEXTS):
+    count = max(min(workers, len(texts) // max(min_shard_texts, 1)), 1)
+    size = -(-len(texts) // count)
+    return [texts[start:start + size] for start in range(0, len(texts), size)]
+
+
+# Pool de processos que classifica listas grandes de textos dividindo-as em fatias.
+# O pool é recriado quando a versão do modelo muda, para que todos os processos usem a mesma.
+class ParallelPredictor:
+
+    def __init__(self, workers=DEFAULT_WORKERS, min_shard_texts=MIN_SHARD_TEXTS):
+        self.workers = max(int(workers), 1)
+        self.min_shard_texts = min_shard_texts
+        self._pool = []
+        self._loaded_key = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self, loaded):
+        if not self._pool or self._loaded_key != (loaded.version, loaded.paths):
+            self._shutdown()
+            # Todos os processos carregam o modelo ao mesmo tempo
+            pool = [_Worker(loaded.paths) for _ in range(self.workers)]
+            try:
+                for worker in pool:
+                    worker.ready()
+            except BaseException:
+                for worker in pool:
+                    worker.close()
+                raise
+            self._pool = pool
+            self._loaded_key = (loaded.version, loaded.paths)
+        return self._pool
+
+    # Troca o pool por um com outra quantidade de processos (criado na próxima previsão)
+    def resize(self, workers):
+        with self._lock:
+            self.workers = max(int(workers), 1)
+            self._shutdown()
+
+    # Retorna as previsões na mesma ordem dos textos recebidos. workers limita quantos processos
+    # esta chamada usa (no máximo o tamanho do pool).
+    def predict(self, texts, loaded=None, workers=None):
+        texts = list(texts)
+        if loaded is None:
+            loaded = get_registry().get()
+        workers = min(workers or self.workers, self.workers)
+        shards = split_shards(texts, workers, self.min_shard_texts)
+        if len(shards) < 2:
+            return predict_sentiments(texts, loaded=loaded)
+
+        with self._lock:
+            results = self._predict_shards(shards, loaded)
+        return [prediction for shard_predictions in results for prediction in shard_predictions]
+
+    # Uma fatia por processo. Se algum processo carregou outra versão do modelo (os arquivos
+    # foram trocados durante a partida do pool), o pool é recriado e as fatias dele são
+    # refeitas; se a versão ainda for outra, elas são classificadas neste processo.
+    def _predict_shards(self, shards, loaded):
+        results = [None] * len(shards)
+        pending = list(range(len(shards)))
+        for _ in range(2):
+            pool = self._get_pool(loaded)
+            try:
+                for index, worker in zip(pending, pool):
+                    worker.send(shards[index])
+                replies = [(index, worker.receive()) for index, worker in zip(pending, pool)]
+            except BaseException:
+                # Um processo com resposta pendente não pode ser reaproveitado
+                self._shutdown()
+                raise
+            for index, (version, shard_predictions, records) in replies:
+                for record in records:
+                    get_stage_metrics().record(record)
+                if version == loaded.version:
+                    results[index] = shard_predictions
+            pending = [index for index in pending if results[index] is None]
+            if not pending:
+                return results
+            self._shutdown()
+        for index in pending:
+            results[index] = predict_sentiments(shards[index], loaded=loaded)
+        return results
+
+    def _shutdown(self):
+        for worker in self._pool:
+            worker.close()
+        self._pool = []
+        self._loaded_key = None
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+# Pool único por processo. Cada chamada usa no máximo workers processos; se alguém pedir mais
+# do que o pool tem, ele é substituído por um maior (o antigo é encerrado).
+_predictor = None
+_predictor_lock = threading.Lock()
+
+
+def get_parallel_predictor(workers=DEFAULT_WORKERS):
+    global _predictor
+    workers = max(int(workers), 1)
+    with _predictor_lock:
+        if _predictor is None:
+            _predictor = ParallelPredictor(workers)
+        elif workers > _predictor.workers:
+            _predictor.resize(workers)
+        return _predictor
@@ -0,0 +1,222 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from model_registry import get_registry, predict_sentiments
+from parallel_inference import get_parallel_predictor
+
+# Quantidade de textos mantidos na memória (LRU)
+MEMORY_CACHE_ENTRIES = 200000
+
+# Banco SQLite com as previsões já feitas. A camada em disco é opcional e vem desligada: com o
+# Naive Bayes, classificar de novo costuma ser mais rápido do que ler do SQLite, então ela só
+# compensa para pedidos pequenos e repetidos entre reinícios (serviço HTTP, --disk-cache).
+DISK_CACHE_PATH = 'prediction_cache.sqlite3'
+
+# Lotes com mais textos do que isso não passam pelo disco (análises em massa e em blocos)
+DISK_CACHE_MAX_BATCH = 1000
+
+# Previsões guardadas no banco, somando todas as versões do modelo. Ao passar do limite, as
+# usadas há mais tempo são apagadas até sobrar DISK_CACHE_TRIM_TO do limite.
+DISK_CACHE_MAX_ROWS = 2000000
+DISK_CACHE_TRIM_TO = 0.9
+
+# Limite de parâmetros por consulta no SQLite
+_SQLITE_BATCH = 500
+
+
+# Normalização usada como chave do cache. Só aplica transformações que não mudam o resultado do
+# vetorizador: espaços extras nunca formam tokens de palavras, e a caixa só importa se lowercase=False.
+def make_normalizer(vectorizer):
+    if (getattr(vectorizer, 'analyzer', 'word') != 'word'
+            or callable(getattr(vectorizer, 'tokenizer', None))
+            or callable(getattr(vectorizer, 'preprocessor', None))):
+        return str
+    if getattr(vectorizer, 'lowercase', True):
+        return lambda text: ' '.join(str(text).split()).lower()
+    return lambda text: ' '.join(str(text).split())
+
+
+# Previsões por versão do modelo, em memória (LRU) e, se disk_path for informado, em disco.
+# O SQLite tem o seu próprio lock: quem acha tudo na memória não espera leituras e gravações
+# de outras threads no disco. Cada versão tem as suas próprias
+# entradas: um processo usando outro modelo (ex.: batch_cli.py --model) não apaga as do app, e
+# as de versões antigas simplesmente deixam de ser usadas e saem pela ordem de uso.
+class PredictionCache:
+
+    def __init__(self, max_entries=MEMORY_CACHE_ENTRIES, disk_path=None, max_disk_rows=DISK_CACHE_MAX_ROWS,
+                 disk_max_batch=DISK_CACHE_MAX_BATCH):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.max_disk_rows = max_disk_rows
+        self.disk_max_batch = disk_max_batch
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._db = None
+        self._disk_rows = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._db is None and self.disk_path:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                ' version TEXT NOT NULL, text TEXT NOT NULL, sentiment TEXT NOT NULL,'
+                ' used_at REAL NOT NULL DEFAULT 0, PRIMARY KEY (version, text))'
+            )
+            # Bancos criados antes do limite de tamanho não têm a coluna used_at
+            columns = [row[1] for row in self._db.execute('PRAGMA table_info(predictions)')]
+            if 'used_at' not in columns:
+                self._db.execute('ALTER TABLE predictions ADD COLUMN used_at REAL NOT NULL DEFAULT 0')
+            self._db.execute('CREATE INDEX IF NOT EXISTS predictions_by_use ON predictions (used_at)')
+            self._db.commit()
+            self._disk_rows = self._db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        return self._db
+
+    def _use_disk(self, count):
+        return bool(self.disk_path) and 0 < count <= self.disk_max_batch
+
+    # Busca as chaves no cache; retorna {chave: sentimento} apenas com as encontradas
+    def get_many(self, version, keys):
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = (version, key)
+                if entry in self._memory:
+                    self._memory.move_to_end(entry)
+                    found[key] = self._memory[entry]
+                else:
+                    missing.append(key)
+            self.memory_hits += len(found)
+
+        rows = self._disk_get(version, missing) if self._use_disk(len(missing)) else []
+        with self._lock:
+            for text, sentiment in rows:
+                found[text] = sentiment
+                self._remember(version, text, sentiment)
+            self.disk_hits += len(rows)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _disk_get(self, version, keys):
+        found = []
+        with self._disk_lock:
+            db = self._connect()
+            now = time.time()
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = db.execute(
+                    f'SELECT text, sentiment FROM predictions WHERE version = ? AND text IN ({placeholders})',
+                    (version, *batch),
+                ).fetchall()
+                if rows:
+                    db.execute(
+                        f'UPDATE predictions SET used_at = ? WHERE version = ? AND text IN ({placeholders})',
+                        (now, version, *batch),
+                    )
+                found.extend(rows)
+            db.commit()
+        return found
+
+    def put_many(self, version, items):
+        with self._lock:
+            for key, sentiment in items.items():
+                self._remember(version, key, sentiment)
+        if not self._use_disk(len(items)):
+            return
+        with self._disk_lock:
+            db = self._connect()
+            now = time.time()
+            cursor = db.executemany(
+                'INSERT OR IGNORE INTO predictions (version, text, sentiment, used_at) VALUES (?, ?, ?, ?)',
+                ((version, key, sentiment, now) for key, sentiment in items.items()),
+            )
+            self._disk_rows += max(cursor.rowcount, 0)
+            if self._disk_rows > self.max_disk_rows:
+                self._trim_disk(db)
+            db.commit()
+
+    # Apaga as previsões usadas há mais tempo (de qualquer versão)
+    def _trim_disk(self, db):
+        excess = self._disk_rows - int(self.max_disk_rows * DISK_CACHE_TRIM_TO)
+        db.execute(
+            'DELETE FROM predictions WHERE rowid IN (SELECT rowid FROM predictions ORDER BY used_at LIMIT ?)',
+            (excess,),
+        )
+        self._disk_rows = db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+    def _remember(self, version, key, sentiment):
+        entry = (version, key)
+        self._memory[entry] = sentiment
+        self._memory.move_to_end(entry)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_entries': len(self._memory),
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache()
+    return _cache
+
+
+# Liga a camada em disco do cache do processo (chamado na partida, antes das previsões)
+def enable_disk_cache(path=DISK_CACHE_PATH):
+    cache = get_prediction_cache()
+    with cache._disk_lock:
+        cache.disk_path = path
+    return cache
+
+
+# Classifica os textos usando o cache. Cada comentário distinto é vetorizado no máximo uma vez
+# e o resultado é espalhado de volta para todas as posições em que aparece.
+# Se stats for um dicionário, recebe os números desta chamada (total, únicos e acertos no cache).
+# Com workers > 1 os comentários ainda não vistos são classificados em paralelo.
+def predict_cached(texts, loaded=None, cache=None, stats=None, workers=1):
+    if loaded is None:
+        loaded = get_registry().get()
+    if cache is None:
+        cache = get_prediction_cache()
+
+    normalize = make_normalizer(loaded.vectorizer)
+    keys = [normalize(text) for text in texts]
+    unique_keys = list(dict.fromkeys(keys))
+
+    results = cache.get_many(loaded.version, unique_keys)
+    hits = len(results)
+    missing = [key for key in unique_keys if key not in results]
+    if missing:
+        if workers > 1:
+            predictions = get_parallel_predictor(workers).predict(missing, loaded=loaded, workers=workers)
+        else:
+            predictions = predict_sentiments(missing, loaded=loaded)
+        new_results = dict(zip(missing, predictions))
+        cache.put_many(loaded.version, new_results)
+        results.update(new_results)
+
+    if stats is not None:
+        stats.update({'total': len(keys), 'unique': len(unique_keys), 'hits': hits})
+    return [results[key] for key in keys]
@@ -0,0 +1,178 @@
+# Resultados da análise em massa servidos uma página por vez.
+#
+# Os comentários e sentimentos ficam em um SQLite temporário no servidor, e o navegador recebe
+# apenas a página exibida. Cada linha guarda a sua posição entre as linhas do mesmo sentimento,
+# então qualquer página (com ou sem filtro de sentimento) é uma busca por intervalo no índice, com
+# custo que não depende do tamanho do resultado. A busca por trecho do comentário usa um índice
+# de trigramas (FTS5), criado apenas na primeira busca; em versões do SQLite sem ele (anteriores
+# à 3.34) as buscas percorrem a tabela.
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+
+import pandas as pd
+
+from csv_pipeline import COMMENT_COLUMN, CSV_CHUNK_ROWS, SENTIMENT_COLUMN, iter_result_chunks
+
+logger = logging.getLogger(__name__)
+
+# Linhas enviadas ao navegador por página
+PAGE_SIZE = 50
+
+# O índice de trigramas só atende buscas com pelo menos 3 caracteres; as menores percorrem a tabela
+SEARCH_MIN_CHARS = 3
+
+# Cache de páginas do SQLite (em KiB) durante a montagem do índice de trigramas. Com o cache
+# padrão (2 MiB) a montagem fica dezenas de vezes mais lenta em resultados grandes.
+SEARCH_BUILD_CACHE_KIB = 256 * 1024
+
+# Contagens de buscas guardadas por índice: o Streamlit refaz a contagem a cada interação
+SEARCH_COUNT_CACHE = 256
+
+
+# Caixa usada na busca sem o índice de trigramas. O LIKE do SQLite só ignora a caixa em letras
+# ASCII ("ÓT" não acharia "ótimo"), então os dois lados são convertidos pelo Python, como o
+# índice de trigramas faz com o texto indexado.
+def _fold_case(text):
+    return text.lower() if isinstance(text, str) else text
+
+
+class ResultIndex:
+
+    def __init__(self, path=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='resultado_indice_', suffix='.sqlite3')
+            os.close(fd)
+        self.path = path
+        self.rows = 0
+        self.sentiment_counts = Counter()
+        self._lock = threading.Lock()
+        # None: índice de busca ainda não montado; 'fts': trigramas; 'scan': percorre a tabela
+        self._search_mode = None
+        self._search_counts = {}
+        # Arquivo descartável: sem journal e sem fsync, a montagem fica bem mais rápida
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=OFF')
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.create_function('fold_case', 1, _fold_case)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' id INTEGER PRIMARY KEY, comment TEXT NOT NULL, sentiment TEXT NOT NULL, position INTEGER NOT NULL)'
+        )
+
+    # Índice a partir do DataFrame da análise em memória
+    @classmethod
+    def from_frame(cls, frame, chunk_rows=CSV_CHUNK_ROWS):
+        index = cls()
+        index.add_chunks(frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows))
+        return index
+
+    # Índice a partir do arquivo gravado pela análise em blocos (CSV, CSV com gzip ou Parquet)
+    @classmethod
+    def from_results(cls, path, chunk_rows=CSV_CHUNK_ROWS):
+        index = cls()
+        index.add_chunks(iter_result_chunks(path, chunk_rows))
+        return index
+
+    def add_chunks(self, chunks):
+        with self._lock:
+            for chunk in chunks:
+                comments = chunk[COMMENT_COLUMN].fillna('').astype(str)
+                sentiments = chunk[SENTIMENT_COLUMN].fillna('').astype(str)
+                # Posição de cada linha entre as do mesmo sentimento, continuando do bloco anterior
+                positions = sentiments.groupby(sentiments).cumcount() + sentiments.map(self.sentiment_counts).fillna(0)
+                ids = range(self.rows + 1, self.rows + len(chunk) + 1)
+                self._db.executemany('INSERT INTO results (id, comment, sentiment, position) VALUES (?, ?, ?, ?)',
+                                     zip(ids, comments, sentiments, positions.astype(int).tolist()))
+                self.rows += len(chunk)
+                self._search_counts.clear()
+                self.sentiment_counts.update(sentiments.value_counts().to_dict())
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_by_sentiment ON results (sentiment, position)')
+            self._db.commit()
+
+    def _ensure_search_index(self):
+        if self._search_mode is not None:
+            return self._search_mode
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS comments USING fts5("
+                             "comment, content='results', content_rowid='id', tokenize='trigram')")
+        except sqlite3.OperationalError as error:
+            logger.warning("Índice de trigramas indisponível no SQLite %s (%s); a busca vai percorrer a tabela",
+                           sqlite3.sqlite_version, error)
+            self._search_mode = 'scan'
+            return self._search_mode
+        self._db.execute(f'PRAGMA cache_size=-{SEARCH_BUILD_CACHE_KIB}')
+        try:
+            self._db.execute("INSERT INTO comments (comments) VALUES ('rebuild')")
+            self._db.commit()
+        finally:
+            self._db.execute('PRAGMA cache_size=-2000')
+        self._search_mode = 'fts'
+        return self._search_mode
+
+    # Se a próxima busca já encontra o índice de busca pronto (a primeira o monta)
+    @property
+    def searchable(self):
+        return self._search_mode is not None
+
+    # Consulta (FROM + WHERE) e parâmetros das linhas que passam pelos filtros de busca.
+    # A busca ignora a caixa nos dois caminhos, inclusive em letras acentuadas.
+    def _search_query(self, sentiment, search):
+        search = _fold_case(search)
+        if len(search) >= SEARCH_MIN_CHARS and self._ensure_search_index() == 'fts':
+            query = 'FROM comments JOIN results ON results.id = comments.rowid WHERE comments MATCH ?'
+            params = ['"' + search.replace('"', '""') + '"']
+        else:
+            query = 'FROM results WHERE instr(fold_case(comment), ?) > 0'
+            params = [search]
+        if sentiment:
+            query += ' AND results.sentiment = ?'
+            params.append(sentiment)
+        return query, params
+
+    # Linhas que passam pelos filtros (sentiment=None e search vazio: todas)
+    def count(self, sentiment=None, search=''):
+        if not search:
+            return self.sentiment_counts.get(sentiment, 0) if sentiment else self.rows
+        with self._lock:
+            key = (sentiment, _fold_case(search))
+            if key not in self._search_counts:
+                if len(self._search_counts) >= SEARCH_COUNT_CACHE:
+                    self._search_counts.clear()
+                query, params = self._search_query(sentiment, search)
+                self._search_counts[key] = self._db.execute('SELECT COUNT(*) ' + query, params).fetchone()[0]
+            return self._search_counts[key]
+
+    # Página number (começando em 0) como DataFrame indexado pelo número da linha no arquivo
+    def page(self, number, sentiment=None, search='', page_size=PAGE_SIZE):
+        start = number * page_size
+        with self._lock:
+            if search:
+                query, params = self._search_query(sentiment, search)
+                rows = self._db.execute(
+                    'SELECT results.id, results.comment, results.sentiment ' + query + ' ORDER BY results.id'
+                    ' LIMIT ? OFFSET ?', params + [page_size, start]).fetchall()
+            elif sentiment:
+                rows = self._db.execute(
+                    'SELECT id, comment, sentiment FROM results WHERE sentiment = ? AND position >= ?'
+                    ' ORDER BY position LIMIT ?', (sentiment, start, page_size)).fetchall()
+            else:
+                rows = self._db.execute(
+                    'SELECT id, comment, sentiment FROM results WHERE id > ? ORDER BY id LIMIT ?',
+                    (start, page_size)).fetchall()
+        frame = pd.DataFrame(rows, columns=['Linha', COMMENT_COLUMN, SENTIMENT_COLUMN])
+        return frame.set_index('Linha')
+
+    def size_bytes(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,149 @@
+import datetime
+import logging
+import os
+import threading
+
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Configurando autenticação do Google Sheets
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+TOKEN_PATH = 'token.json'
+CLIENT_SECRETS_PATH = 'credentials.json'
+
+# URL do arquivo token.json no GitHub
+GITHUB_CREDENTIALS_URL = "https://github.com/dreymond1/streamlitapp/blob/main/token.json"
+
+# Antecedência (em segundos) com que o token é renovado em segundo plano antes de expirar
+REFRESH_MARGIN = 300
+
+# Espera (em segundos) antes de tentar de novo quando a renovação em segundo plano falha
+REFRESH_RETRY = 60
+
+
+# Faz o download do arquivo token.json do GitHub
+def download_credentials_from_github(url, filename=TOKEN_PATH):
+    import requests
+
+    response = requests.get(url)
+    if response.status_code == 200:
+        with open(filename, "wb") as file:
+            file.write(response.content)
+    else:
+        raise Exception(f"Erro ao baixar o arquivo: {response.status_code}")
+
+
+# Cliente do Google Sheets criado sob demanda: nada de rede (download do token, OAuth)
+# acontece até a primeira chamada de build_service(). As bibliotecas do Google também
+# só são importadas nesse momento, então a partida do app depende apenas da carga do modelo.
+# Só as credenciais pertencem ao cliente; os serviços criados aqui ficam no pool do sheets_scheduler.
+class SheetsClient:
+
+    def __init__(self, token_path=TOKEN_PATH, client_secrets_path=CLIENT_SECRETS_PATH,
+                 credentials_url=GITHUB_CREDENTIALS_URL, refresh_margin=REFRESH_MARGIN):
+        self.token_path = token_path
+        self.client_secrets_path = client_secrets_path
+        self.credentials_url = credentials_url
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._creds = None
+        self._timer = None
+
+    def _load_credentials(self):
+        from google.oauth2.credentials import Credentials
+
+        # Baixar o token.json se não existir
+        if not os.path.exists(self.token_path) and self.credentials_url:
+            with stage('google_token_download'):
+                download_credentials_from_github(self.credentials_url, self.token_path)
+
+        creds = None
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                self._refresh(creds)
+            else:
+                from google_auth_oauthlib.flow import InstalledAppFlow
+                flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_path, SCOPES)
+                creds = flow.run_local_server(port=0)
+                self._save(creds)
+        return creds
+
+    def _refresh(self, creds):
+        from google.auth.transport.requests import Request
+
+        with stage('google_oauth_refresh'):
+            creds.refresh(Request())
+        self._save(creds)
+
+    def _save(self, creds):
+        with open(self.token_path, 'w') as token:
+            token.write(creds.to_json())
+
+    # Agenda a próxima renovação para refresh_margin segundos antes da expiração do token
+    def _schedule_refresh(self, delay=None):
+        if self._timer is not None:
+            self._timer.cancel()
+        if delay is None:
+            expiry = getattr(self._creds, 'expiry', None)
+            if expiry is None or not getattr(self._creds, 'refresh_token', None):
+                return
+            # O google-auth guarda a expiração em UTC sem fuso horário
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            delay = max((expiry - now).total_seconds() - self.refresh_margin, 0)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            try:
+                # O serviço usa o mesmo objeto de credenciais, então passa a enviar o token novo
+                self._refresh(self._creds)
+            except Exception:
+                logger.exception("Falha ao renovar o token do Google, nova tentativa em %ds", REFRESH_RETRY)
+                self._schedule_refresh(REFRESH_RETRY)
+                return
+            self._schedule_refresh()
+
+    # Credenciais carregadas uma vez por processo e renovadas em segundo plano
+    def _credentials(self):
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+                self._schedule_refresh()
+            return self._creds
+
+    # Serviço novo com as credenciais do processo. A conexão HTTP (httplib2) de um serviço não
+    # pode ser usada por duas threads ao mesmo tempo, e cada sessão do Streamlit roda na sua
+    # thread, então cada execução (ou thread do processamento concorrente) cria o seu.
+    def build_service(self):
+        from googleapiclient.discovery import build
+
+        credentials = self._credentials()
+        # Documento de discovery distribuído com a biblioteca: sem requisição HTTP
+        with stage('sheets_build'):
+            return build('sheets', 'v4', credentials=credentials, static_discovery=True, cache_discovery=False)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+# Cliente único por processo (o Streamlit reexecuta o app.py, mas este módulo permanece carregado)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sheets_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SheetsClient()
+    return _client
@@ -0,0 +1,386 @@
+# Processa várias planilhas/abas ao mesmo tempo, respeitando as cotas da API do Google Sheets.
+#
+# Cada alvo (planilha, aba, coluna de comentário, coluna de sentimento) é processado por
+# process_comments_and_sentiments em uma thread. As threads pegam conexões de um pool (uma
+# conexão HTTP não pode ser usada por duas threads ao mesmo tempo) e todas as chamadas passam
+# por baldes de fichas compartilhados, um para leituras e outro para escritas. Respostas 429 e
+# 5xx são repetidas com espera exponencial.
+import logging
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from sheets_client import get_sheets_client
+from sheets_sync import READ_CHUNK_ROWS, WRITE_CHUNK_CELLS, get_state_store, process_comments_and_sentiments
+
+logger = logging.getLogger(__name__)
+
+# Planilhas processadas ao mesmo tempo
+MAX_WORKERS = 4
+
+# Cotas padrão da API do Sheets por usuário (requisições por minuto)
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+
+# Rajada máxima permitida quando o balde está cheio. Ela faz parte da cota: a reposição é de
+# (cota - rajada) por minuto, para que nenhuma janela de 60s passe da cota
+BUCKET_CAPACITY = 10
+
+# Respostas que valem uma nova tentativa
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 64.0
+
+# Métodos da API que contam na cota de escrita
+WRITE_METHODS = {'batchUpdate', 'update', 'append', 'clear', 'batchClear'}
+
+SyncTarget = namedtuple('SyncTarget', ['spreadsheet_id', 'sheet_name', 'comment_column', 'sentiment_column'])
+
+
+# Uma linha por alvo: "ID;Aba;ColunaComentário;ColunaSentimento" (vírgula ou tabulação também servem)
+def parse_targets(text):
+    targets = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        for separator in (';', '\t', ','):
+            if separator in line:
+                fields = [field.strip() for field in line.split(separator)]
+                break
+        else:
+            fields = [line]
+        if len(fields) != 4 or not all(fields):
+            raise ValueError(f"Linha {number}: use ID;Aba;ColunaComentário;ColunaSentimento")
+        targets.append(SyncTarget(*fields))
+    return targets
+
+
+# Balde de fichas: até capacity requisições de uma vez e, em média, rate por segundo
+class TokenBucket:
+
+    def __init__(self, rate, capacity=BUCKET_CAPACITY):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Bloqueia até haver uma ficha; retorna o tempo esperado
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    # Após um 429 todas as threads esperam o balde encher de novo, em vez de insistir
+    def drain(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+# Balde para uma cota de per_minute requisições por minuto. Em qualquer janela de 60s saem no máximo
+# capacity (balde cheio) + rate * 60 requisições, então a rajada é descontada da reposição; com
+# capacity somada à cota inteira, o primeiro minuto chegaria a 70 requisições para uma cota de 60.
+def quota_bucket(per_minute, capacity=BUCKET_CAPACITY):
+    capacity = max(min(capacity, per_minute / 2), 1)
+    return TokenBucket(per_minute / 60, capacity)
+
+
+# Código HTTP de um erro da API (googleapiclient.errors.HttpError ou equivalente), se houver
+def error_status(error):
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(error):
+    headers = getattr(error, 'resp', None)
+    try:
+        return float(headers.get('retry-after')) if headers is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# Requisição que respeita o balde de fichas e repete falhas temporárias
+class _LimitedRequest:
+
+    def __init__(self, request, limiter, method):
+        self._request = request
+        self._limiter = limiter
+        self._method = method
+
+    def execute(self):
+        return self._limiter.execute(self._request, self._method in WRITE_METHODS)
+
+
+# Envolve o serviço (ou um recurso dele, como spreadsheets() e values()) sem mudar a interface:
+# o sheets_sync continua chamando service.spreadsheets().values().get(...).execute()
+class _LimitedResource:
+
+    def __init__(self, resource, limiter):
+        self._resource = resource
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._resource, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return _LimitedRequest(result, self._limiter, name)
+            return _LimitedResource(result, self._limiter)
+        return call
+
+
+class RateLimiter:
+
+    def __init__(self, reads_per_minute=READ_REQUESTS_PER_MINUTE, writes_per_minute=WRITE_REQUESTS_PER_MINUTE,
+                 capacity=BUCKET_CAPACITY, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, sleep=time.sleep):
+        self.read_bucket = quota_bucket(reads_per_minute, capacity)
+        self.write_bucket = quota_bucket(writes_per_minute, capacity)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+
+    def wrap(self, service, status=None):
+        return _LimitedResource(service, _BoundLimiter(self, status))
+
+    def execute(self, request, write, status=None):
+        bucket = self.write_bucket if write else self.read_bucket
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            if status is not None:
+                status.add(requests=1, throttled_seconds=waited)
+            try:
+                return request.execute()
+            except Exception as error:
+                code = error_status(error)
+                transient = code in RETRY_STATUSES or (code is None and isinstance(error, (ConnectionError,
+                                                                                           TimeoutError)))
+                if not transient or attempt >= self.max_retries:
+                    raise
+                if code == 429:
+                    bucket.drain()
+                # Espera exponencial com jitter completo (ou o Retry-After informado pela API)
+                delay = _retry_after(error)
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                if status is not None:
+                    status.add(retries=1)
+                logger.warning("Sheets respondeu %s, nova tentativa %d/%d em %.1fs",
+                               code or type(error).__name__, attempt, self.max_retries, delay)
+                self._sleep(delay)
+
+
+# Limitador compartilhado + status do alvo que está usando o serviço
+class _BoundLimiter:
+
+    def __init__(self, limiter, status):
+        self._limiter = limiter
+        self._status = status
+
+    def execute(self, request, write):
+        return self._limiter.execute(request, write, self._status)
+
+
+# Limitador único por processo: as cotas da API são por usuário, então as execuções de todas as
+# sessões do app (uma planilha ou várias) precisam dividir os mesmos baldes
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+# Conexões reutilizadas entre os alvos: no máximo size, criadas sob demanda por factory()
+class ServicePool:
+
+    def __init__(self, factory, size=MAX_WORKERS):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            service = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    service = self.factory()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                service = self._idle.get()
+        try:
+            yield service
+        finally:
+            self._idle.put(service)
+
+
+# Pool único por processo, como o limitador: as conexões ficam abertas entre os cliques e as sessões,
+# em vez de um pool (e serviços novos) a cada execução. Cria os serviços com o cliente do processo.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_service_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ServicePool(lambda: get_sheets_client().build_service(), MAX_WORKERS)
+    return _pool
+
+
+class TargetStatus:
+
+    def __init__(self, target):
+        self.target = target
+        self.state = 'pendente'
+        self.rows_read = 0
+        self.row_count = 0
+        self.updated = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def add(self, requests=0, retries=0, throttled_seconds=0.0):
+        with self._lock:
+            self.requests += requests
+            self.retries += retries
+            self.throttled_seconds += throttled_seconds
+
+    @property
+    def seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'planilha': self.target.spreadsheet_id,
+                'aba': self.target.sheet_name,
+                'estado': self.state,
+                'linhas_lidas': self.rows_read,
+                'linhas_total': self.row_count,
+                'atualizadas': self.updated,
+                'requisicoes': self.requests,
+                'novas_tentativas': self.retries,
+                'espera_cota_s': round(self.throttled_seconds, 2),
+                'segundos': round(self.seconds, 2),
+                'erro': self.error,
+            }
+
+
+# Processa vários alvos em paralelo. As conexões vêm do pool do processo (get_service_pool), a menos
+# que service_factory seja informado (ex.: um serviço falso nos testes), caso em que o agendador tem
+# um pool próprio.
+class SheetsSyncScheduler:
+
+    def __init__(self, service_factory=None, max_workers=MAX_WORKERS, limiter=None, state_store=None, cache=None,
+                 read_chunk_rows=READ_CHUNK_ROWS, write_chunk_cells=WRITE_CHUNK_CELLS, incremental=False,
+                 restart=False):
+        self.max_workers = max(int(max_workers), 1)
+        if service_factory is None:
+            self.pool = get_service_pool()
+        else:
+            self.pool = ServicePool(service_factory, self.max_workers)
+        self.limiter = limiter or get_rate_limiter()
+        # O estado do processo inteiro: o lock dele serializa as gravações das threads e das sessões
+        self.state_store = state_store or get_state_store()
+        self.cache = cache
+        self.read_chunk_rows = read_chunk_rows
+        self.write_chunk_cells = write_chunk_cells
+        self.incremental = incremental
+        self.restart = restart
+        self.statuses = []
+
+    def _process(self, status):
+        target = status.target
+        status.state = 'executando'
+        status.started_at = time.monotonic()
+
+        def progress(rows_read, row_count, updated):
+            status.rows_read, status.row_count, status.updated = rows_read, row_count, updated
+
+        try:
+            with self.pool.connection() as service:
+                status.updated = process_comments_and_sentiments(
+                    self.limiter.wrap(service, status), target.spreadsheet_id, target.sheet_name,
+                    target.comment_column, target.sentiment_column,
+                    read_chunk_rows=self.read_chunk_rows, write_chunk_cells=self.write_chunk_cells,
+                    progress=progress, incremental=self.incremental, state_store=self.state_store,
+                    cache=self.cache, restart=self.restart)
+            status.state = 'concluido'
+        except Exception as error:
+            logger.exception("Falha ao processar %s/%s", target.spreadsheet_id, target.sheet_name)
+            status.state = 'erro'
+            status.error = f"{type(error).__name__}: {error}"
+        finally:
+            status.finished_at = time.monotonic()
+        return status
+
+    def report(self):
+        return [status.as_dict() for status in self.statuses]
+
+    # Processa todos os alvos e retorna o relatório. on_update(relatório) é chamado na thread que
+    # chamou run() a cada poll_interval segundos, o que permite atualizar a interface do Streamlit.
+    def run(self, targets, on_update=None, poll_interval=0.5):
+        # O mesmo alvo repetido faria duas threads escreverem nas mesmas células
+        unique = list(dict.fromkeys(SyncTarget(*target) for target in targets))
+        self.statuses = [TargetStatus(target) for target in unique]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sheets-sync') as executor:
+            pending = {executor.submit(self._process, status) for status in self.statuses}
+            while pending:
+                _, pending = wait(pending, timeout=poll_interval if on_update else None,
+                                  return_when=FIRST_COMPLETED)
+                if on_update is not None:
+                    on_update(self.report())
+        return self.report()
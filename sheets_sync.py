@@ -0,0 +1,237 @@
+import json
+import os
+import tempfile
+import threading
+
+from model_registry import get_registry
+from prediction_cache import predict_cached
+
+# Quantidade de linhas lidas da planilha por requisição
+READ_CHUNK_ROWS = 10000
+
+# Quantidade máxima de células enviadas em um único batchUpdate
+WRITE_CHUNK_CELLS = 10000
+
+# Arquivo com a marca d'água e os checkpoints de cada planilha/aba
+STATE_PATH = 'sheets_state.json'
+
+
+# Converte a letra da coluna em índice (A -> 0, Z -> 25, AA -> 26)
+def column_to_index(column):
+    index = 0
+    for char in column.strip().upper():
+        if not 'A' <= char <= 'Z':
+            raise ValueError(f"Coluna inválida: {column!r}")
+        index = index * 26 + (ord(char) - ord('A') + 1)
+    if index == 0:
+        raise ValueError(f"Coluna inválida: {column!r}")
+    return index - 1
+
+
+# Número de linhas da aba (tamanho da grade, incluindo linhas vazias no final)
+def get_row_count(service, spreadsheet_id, sheet_name):
+    result = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        ranges=[sheet_name],
+        fields='sheets(properties(title,gridProperties(rowCount)))',
+    ).execute()
+    for sheet_info in result.get('sheets', []):
+        properties = sheet_info.get('properties', {})
+        if properties.get('title') == sheet_name:
+            return properties.get('gridProperties', {}).get('rowCount', 0)
+    raise ValueError(f"Aba não encontrada: {sheet_name!r}")
+
+
+# Lê as linhas [first_row, last_row] (numeração da planilha, começando em 1)
+def read_rows(service, spreadsheet_id, sheet_name, comment_column, sentiment_column, first_row, last_row):
+    range_to_read = f"{sheet_name}!{comment_column}{first_row}:{sentiment_column}{last_row}"
+    result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_to_read).execute()
+    return result.get('values', [])
+
+
+# Agrupa as linhas previstas em intervalos contíguos: [(linha_inicial, [valores]), ...]
+def coalesce_ranges(predictions):
+    blocks = []
+    for row_number, value in sorted(predictions):
+        if blocks and blocks[-1][0] + len(blocks[-1][1]) == row_number:
+            blocks[-1][1].append(value)
+        else:
+            blocks.append((row_number, [value]))
+    return blocks
+
+
+# Envia os blocos em um ou mais batchUpdate, respeitando o limite de células por requisição
+def write_blocks(service, spreadsheet_id, sheet_name, sentiment_column, blocks, max_cells=WRITE_CHUNK_CELLS):
+    requests_sent = 0
+    data = []
+    cells = 0
+
+    def flush():
+        nonlocal data, cells, requests_sent
+        if data:
+            body = {'valueInputOption': 'RAW', 'data': data}
+            service.spreadsheets().values().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
+            requests_sent += 1
+        data = []
+        cells = 0
+
+    for first_row, values in blocks:
+        # Blocos maiores que o limite são divididos em pedaços
+        for offset in range(0, len(values), max_cells):
+            piece = values[offset:offset + max_cells]
+            if cells + len(piece) > max_cells:
+                flush()
+            start = first_row + offset
+            end = start + len(piece) - 1
+            data.append({'range': f"{sheet_name}!{sentiment_column}{start}:{sentiment_column}{end}",
+                         'values': [[value] for value in piece]})
+            cells += len(piece)
+    flush()
+    return requests_sent
+
+
+# Estado persistido por planilha/aba/colunas:
+#   watermark: última linha não vazia já processada, lendo a aba em sequência desde a linha 2
+#   checkpoint: próxima linha a ler de uma execução que não terminou
+#   checkpoint_mode: modo ('incremental' ou 'completo') da execução que deixou o checkpoint
+class SheetsStateStore:
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(spreadsheet_id, sheet_name, comment_column, sentiment_column):
+        return f"{spreadsheet_id}|{sheet_name}|{comment_column.upper()}|{sentiment_column.upper()}"
+
+    def _read_all(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, key):
+        with self._lock:
+            state = self._read_all().get(key, {})
+        return {
+            'watermark': state.get('watermark', 1),
+            'checkpoint': state.get('checkpoint'),
+            'checkpoint_mode': state.get('checkpoint_mode'),
+        }
+
+    # Gravação atômica: escreve em um arquivo temporário e substitui o original
+    def save(self, key, state):
+        with self._lock:
+            all_states = self._read_all()
+            all_states[key] = state
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.sheets_state_', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                    json.dump(all_states, file)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def reset(self, key):
+        self.save(key, {})
+
+
+# Estado único por processo: save() relê e substitui o arquivo inteiro, então as sessões do app e
+# as threads do processamento em paralelo precisam passar pelo mesmo lock para não perderem
+# as marcas d'água umas das outras
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store():
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                _state_store = SheetsStateStore()
+    return _state_store
+
+
+# Extrai de um bloco lido as linhas com comentário e sem sentimento: [(linha, comentário), ...]
+def find_pending(rows, first_row, sentiment_offset):
+    pending = []
+    for i, row in enumerate(rows):
+        comment = row[0] if len(row) > 0 else ""  # Verificar se há comentário
+        sentiment = row[sentiment_offset] if len(row) > sentiment_offset else ""  # Verificar se há sentimento
+        if comment and not sentiment:  # Só processa se houver comentário sem sentimento
+            pending.append((first_row + i, comment))
+    return pending
+
+
+# Preenche a coluna de sentimento de todas as linhas com comentário e sem sentimento.
+# A aba é lida em blocos de read_chunk_rows linhas; cada bloco é classificado em lote e
+# escrito de volta em intervalos contíguos, então a memória usada não depende do tamanho da planilha.
+#
+# Após cada bloco o progresso é salvo em state_store, e uma execução interrompida continua do
+# ponto onde parou na próxima execução do mesmo modo (restart=True recomeça do início). Com
+# incremental=True (planilhas que só crescem no final) a leitura começa logo após a última linha
+# não vazia já processada; linhas em branco no meio ou no fim da aba não travam a marca d'água.
+def process_comments_and_sentiments(service, spreadsheet_id, sheet_name, comment_column, sentiment_column,
+                                    read_chunk_rows=READ_CHUNK_ROWS, write_chunk_cells=WRITE_CHUNK_CELLS,
+                                    progress=None, incremental=False, state_store=None, cache=None, restart=False):
+    sentiment_offset = column_to_index(sentiment_column) - column_to_index(comment_column)
+    if sentiment_offset <= 0:
+        raise ValueError("A coluna de sentimento deve estar à direita da coluna de comentário")
+
+    if state_store is None:
+        state_store = get_state_store()
+    key = state_store.key(spreadsheet_id, sheet_name, comment_column, sentiment_column)
+    state = state_store.load(key)
+    mode = 'incremental' if incremental else 'completo'
+
+    # Uma única versão do modelo para a execução inteira
+    loaded = get_registry().get()
+    row_count = get_row_count(service, spreadsheet_id, sheet_name)
+
+    # A linha 1 é o cabeçalho. O checkpoint de uma execução do outro modo não vale: uma execução
+    # completa nunca começa no meio da aba por causa de uma incremental interrompida.
+    if state['checkpoint'] and state['checkpoint_mode'] == mode and not restart:
+        start_row = state['checkpoint']
+    elif incremental:
+        start_row = state['watermark'] + 1
+    else:
+        # Execução completa: a marca d'água é recalculada desde o início
+        start_row = 2
+        state['watermark'] = 1
+    start_row = max(start_row, 2)
+
+    updated = 0
+    for first_row in range(start_row, row_count + 1, read_chunk_rows):
+        last_row = min(first_row + read_chunk_rows - 1, row_count)
+        rows = read_rows(service, spreadsheet_id, sheet_name, comment_column, sentiment_column, first_row, last_row)
+        # Em modo incremental a planilha só cresce no final: um bloco vazio indica o fim dos dados
+        if incremental and not rows:
+            break
+
+        pending = find_pending(rows, first_row, sentiment_offset)
+        if pending:
+            predictions = predict_cached([comment for _, comment in pending], loaded=loaded, cache=cache)
+            blocks = coalesce_ranges(zip((row for row, _ in pending), predictions))
+            write_blocks(service, spreadsheet_id, sheet_name, sentiment_column, blocks,
+                         max_cells=write_chunk_cells)
+            updated += len(pending)
+
+        # A API omite as linhas vazias no fim do intervalo, então a última linha devolvida é a última
+        # não vazia do bloco. Linhas em branco depois dela são lidas de novo na próxima execução
+        # incremental, caso sejam preenchidas.
+        if rows:
+            state['watermark'] = max(state['watermark'], first_row + len(rows) - 1)
+        state['checkpoint'] = last_row + 1
+        state['checkpoint_mode'] = mode
+        state_store.save(key, state)
+
+        if progress is not None:
+            progress(last_row, row_count, updated)
+
+    state['checkpoint'] = None
+    state['checkpoint_mode'] = None
+    state_store.save(key, state)
+    return updated
@@ -0,0 +1,5 @@
+# Palavras ignoradas no diagrama de Sankey e nas nuvens de palavras
+NOT_WORDS = [
+    'a', 'à', 'logo', 'desde', 'podem', 'além', 'q', 'sim', 'nao', 'falando', 'lá', 'meus', 'ficou', 'queren', 'sei', 'hoje', 'aqui', 'ficar', 'te', 'mas', 'neste', 'nesta', 'nessa', 'nesse', 'e', 'vou', 'vejo', 'entrará', 'estava', 'meu', 've', 'vê', 'ter', 'logo', 'fosse', 'horas', 'ainda', 'dia', 'falar', 'minuto', 'minutos', 'hora', 'pela', 'dar', 'então', 'sou', 'vou', 'ficaram', 'agora', 'os', 'me', 'algmas', 'algumas', 'alguns', 'ali', 'ambos', 'antes', 'ao', 'aos', 'apenas', 'apoio', 'apos', 'após', 'aquela', 'aquelas', 'aquele', 'aqueles', 'aquilo', 'as', 'às', 'ate', 'até', 'atras', 'atrás', 'bem', 'bom', 'cada', 'certa', 'certas', 'certeza', 'certo', 'certos', 'com', 'como', 'conforme', 'contra', 'contudo', 'da', 'da', 'dá', 'dado', 'das', 'de', 'dela', 'delas', 'dele', 'deles', 'dessa', 'dessas', 'desse', 'desses', 'desta', 'destas', 'deste', 'destes', 'deve', 'devem', 'devera', 'deverá', 'deverao', 'deverão', 'deveria', 'deveriam', 'disse', 'diz', 'dizem', 'dizer', 'do', 'dos', 'duas', 'duplo', 'duplos', 'ela', 'elas', 'ele', 'eles', 'em', 'em', 'enquanto', 'essa', 'essas', 'esse', 'esses', 'esta', 'estamos', 'estão', 'este', 'estes', 'essa', 'esses', 'e', 'eu', 'ela', 'elas', 'isto', 'isso', 'isso', 'isto', 'ja', 'já', 'jamais', 'jamas', 'lugar', 'mais', 'mas', 'mesmo', 'mesmos', 'muito', 'muitos', 'na', 'nas', 'no', 'nos', 'não', 'nós', 'nem', 'nosso', 'nossos', 'ou', 'outra', 'outras', 'outro', 'outros', 'para', 'para', 'para', 'pelo', 'pelas', 'pelo', 'perante', 'pois', 'por', 'porque', 'portanto', 'posso', 'pouca', 'poucas', 'pouco', 'poucos', 'primeiro', 'propria', 'própria', 'próprias', 'próprio', 'próprios', 'quais', 'qual', 'qualquer', 'quando', 'quanto', 'quantos', 'que', 'quem', 'quer', 'quero', 'se', 'seja', 'sejam', 'sejamos', 'sem', 'sempre', 'sendo', 'ser', 'sera', 'será', 'serao', 'serão', 'seria', 'seriam', 'seu', 'seus', 'si', 'sido', 'so', 'só', 'sob', 'sobre', 'sua', 'suas', 'talvez', 'tambem', 'também', 'tanta', 'tantas', 'tanto', 'tao', 'tão', 'te', 'tem', 'temos', 'tendo', 'tenha', 'tenham', 'tenhamos', 'tenho', 'tens', 'ter', 'tera', 'terá', 'terao', 'terão', 'teria', 'teriam', 'teu', 'teus', 'teve', 'tinha', 'tinham', 'tive', 'tivemos', 'tiver', 'tivera', 'tiveram', 'tiverem', 'tivermos', 'tivesse', 'tivessem', 'tivessemos', 'tivéssemos', 'toda', 'todas', 'todo', 'todos', 'tu', 'tua', 'tuas', 'tudo', 'ultimo', 'último', 'um', 'uma', 'umas', 'uns', 'vai', 'vao', 'vão', 'vem', 'vêm', 'vendo', 'ver', 'vez', 'vindo', 'vir', 'voce', 'você', 'voces', 'vocês', 'vos'
+    'a', 'o', 'é', 'mim', 'pra', 'há', 'foi', 'à', 'ainda', 'agora', 'fui', 'estou', 'depois', 'meu', 'p', '','algmas', 'algumas', 'alguns', 'ali', 'ambos', 'antes', 'ao', 'aos', 'apenas', 'apoio', 'apos', 'após', 'aquela', 'aquelas', 'aquele', 'aqueles', 'aquilo', 'as', 'às', 'ate', 'até', 'atras', 'atrás', 'bem', 'bom', 'cada', 'certa', 'certas', 'certeza', 'certo', 'certos', 'com', 'como', 'conforme', 'contra', 'contudo', 'da', 'da', 'dá', 'dado', 'das', 'de', 'dela', 'delas', 'dele', 'deles', 'dessa', 'dessas', 'desse', 'desses', 'desta', 'destas', 'deste', 'destes', 'deve', 'devem', 'devera', 'deverá', 'deverao', 'deverão', 'deveria', 'deveriam', 'disse', 'diz', 'dizem', 'dizer', 'do', 'dos', 'duas', 'duplo', 'duplos', 'ela', 'elas', 'ele', 'eles', 'em', 'em', 'enquanto', 'essa', 'essas', 'esse', 'esses', 'esta', 'estamos', 'estão', 'este', 'estes', 'essa', 'esses', 'e', 'eu', 'ela', 'elas', 'isto', 'isso', 'isso', 'isto', 'ja', 'já', 'jamais', 'jamas', 'lugar', 'mais', 'mas', 'mesmo', 'mesmos', 'muito', 'muitos', 'na', 'nas', 'no', 'nos', 'não', 'nós', 'nem', 'nosso', 'nossos', 'ou', 'outra', 'outras', 'outro', 'outros', 'para', 'para', 'para', 'pelo', 'pelas', 'pelo', 'perante', 'pois', 'por', 'porque', 'portanto', 'posso', 'pouca', 'poucas', 'pouco', 'poucos', 'primeiro', 'propria', 'própria', 'próprias', 'próprio', 'próprios', 'quais', 'qual', 'qualquer', 'quando', 'quanto', 'quantos', 'que', 'quem', 'quer', 'quero', 'se', 'seja', 'sejam', 'sejamos', 'sem', 'sempre', 'sendo', 'ser', 'sera', 'será', 'serao', 'serão', 'seria', 'seriam', 'seu', 'seus', 'si', 'sido', 'so', 'só', 'sob', 'sobre', 'sua', 'suas', 'talvez', 'tambem', 'também', 'tanta', 'tantas', 'tanto', 'tao', 'tão', 'te', 'tem', 'temos', 'tendo', 'tenha', 'tenham', 'tenhamos', 'tenho', 'tens', 'ter', 'tera', 'terá', 'terao', 'terão', 'teria', 'teriam', 'teu', 'teus', 'teve', 'tinha', 'tinham', 'tive', 'tivemos', 'tiver', 'tivera', 'tiveram', 'tiverem', 'tivermos', 'tivesse', 'tivessem', 'tivessemos', 'tivéssemos', 'toda', 'todas', 'todo', 'todos', 'tu', 'tua', 'tuas', 'tudo', 'ultimo', 'último', 'um', 'uma', 'umas', 'uns', 'vai', 'vao', 'vão', 'vem', 'vêm', 'vendo', 'ver', 'vez', 'vindo', 'vir', 'voce', 'você', 'voces', 'vocês', 'vos'
+]
@@ -0,0 +1,21 @@
+import joblib
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+import sheets_sync
+from model_registry import ModelRegistry
+
+
+# Modelo pequeno treinado na hora, no lugar do modelo_naive_bayes.pkl do app
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    vectorizer = CountVectorizer()
+    X = vectorizer.fit_transform(['ótimo gostei recomendo', 'atrasada péssimo quebrado', 'chegou normal ontem'])
+    model = MultinomialNB().fit(X, ['Positivo', 'Negativo', 'Neutro'])
+    joblib.dump(model, tmp_path / 'modelo.pkl')
+    joblib.dump(vectorizer, tmp_path / 'vectorizer.pkl')
+    registry = ModelRegistry(str(tmp_path / 'modelo.pkl'), str(tmp_path / 'vectorizer.pkl'), check_interval=3600)
+    monkeypatch.setattr(sheets_sync, 'get_registry', lambda: registry)
+    return registry
@@ -0,0 +1,16 @@
+from csv_pipeline import CSV_OPTIONS, analyze_csv_stream, read_results
+from prediction_cache import PredictionCache
+
+
+def test_empty_comments_are_not_classified(registry, tmp_path):
+    source = tmp_path / 'comentarios.csv'
+    source.write_text('Comentário;Nota\nótimo gostei;5\n;1\n   ;2\natrasada péssimo;1\n',
+                      encoding=CSV_OPTIONS['encoding'])
+
+    result = analyze_csv_stream(str(source), output_path=str(tmp_path / 'saida.csv'), chunk_rows=2,
+                                loaded=registry.get(), cache=PredictionCache(disk_path=None))
+
+    assert result.rows == 4
+    assert result.sentiment_counts == {'Positivo': 1, 'Negativo': 1}
+    assert '' not in result.word_frequencies
+    assert list(read_results(result.output_path)['Sentimento']) == ['Positivo', '', '', 'Negativo']
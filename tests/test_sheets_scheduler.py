@@ -0,0 +1,68 @@
+import sheets_scheduler
+from benchmarks.fake_sheets import FakeSheetsService
+from prediction_cache import PredictionCache
+from sheets_scheduler import RateLimiter, SheetsSyncScheduler, SyncTarget, quota_bucket
+from sheets_sync import SheetsStateStore
+
+COMMENTS = ['produto ótimo', 'entrega atrasada', 'gostei muito', 'péssimo atendimento', 'chegou ontem',
+            'recomendo', 'veio quebrado', 'normal']
+
+
+def make_sheet(service, spreadsheet_id):
+    service.add_sheet(spreadsheet_id, 'Aba', [['Comentário', 'Sentimento']] + [[comment] for comment in COMMENTS])
+
+
+def test_scheduler_retries_rate_limit_and_unavailable(registry, tmp_path):
+    service = FakeSheetsService()
+    make_sheet(service, 'planilha1')
+    make_sheet(service, 'planilha2')
+    service.fail_next(429, times=2)
+    service.fail_next(503)
+    sleeps = []
+    limiter = RateLimiter(reads_per_minute=60000, writes_per_minute=60000, sleep=sleeps.append)
+    scheduler = SheetsSyncScheduler(lambda: service, max_workers=2, limiter=limiter,
+                                    state_store=SheetsStateStore(str(tmp_path / 'estado.json')),
+                                    cache=PredictionCache(disk_path=None), read_chunk_rows=3)
+
+    report = scheduler.run([SyncTarget('planilha1', 'Aba', 'A', 'B'), SyncTarget('planilha2', 'Aba', 'A', 'B')])
+
+    assert [item['estado'] for item in report] == ['concluido', 'concluido']
+    assert sum(item['novas_tentativas'] for item in report) == 3
+    assert len(sleeps) == 3
+    assert service.failures == 3
+    for spreadsheet_id in ('planilha1', 'planilha2'):
+        assert all(service.column_values(spreadsheet_id, 'Aba', 'B')[1:])
+
+
+def test_bucket_stays_within_quota_in_first_minute(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(sheets_scheduler.time, 'monotonic', lambda: clock[0])
+
+    # Como um sleep de verdade, nunca dorme menos que uma fração mínima de tempo
+    def sleep(seconds):
+        clock[0] += max(seconds, 1e-6)
+    monkeypatch.setattr(sheets_scheduler.time, 'sleep', sleep)
+
+    bucket = quota_bucket(60)
+    granted = 0
+    while True:
+        bucket.acquire()
+        if clock[0] >= 60:
+            break
+        granted += 1
+    assert granted <= 60
+
+
+def test_schedulers_share_the_process_pool(monkeypatch):
+    monkeypatch.setattr(sheets_scheduler, '_pool', None)
+    created = []
+    monkeypatch.setattr(sheets_scheduler, 'get_sheets_client',
+                        lambda: type('Client', (), {'build_service': lambda self: created.append(1) or object()})())
+
+    first, second = SheetsSyncScheduler(), SheetsSyncScheduler()
+    assert first.pool is second.pool
+    with first.pool.connection():
+        pass
+    with second.pool.connection():
+        pass
+    assert len(created) == 1
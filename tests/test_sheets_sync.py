@@ -0,0 +1,100 @@
+import pytest
+
+from benchmarks.fake_sheets import FakeHttpError, FakeSheetsService
+from prediction_cache import PredictionCache
+from sheets_sync import SheetsStateStore, process_comments_and_sentiments
+
+COMMENTS = ['produto ótimo', 'entrega atrasada', 'gostei muito', 'péssimo atendimento', 'chegou ontem',
+            'recomendo', 'veio quebrado', 'normal']
+
+
+def make_sheet(service, comments, spreadsheet_id='planilha', sheet_name='Aba'):
+    service.add_sheet(spreadsheet_id, sheet_name, [['Comentário', 'Sentimento']] + [[comment] for comment in comments])
+
+
+def read_ranges(service):
+    return [call[2] for call in service.calls if call[0] == 'get' and isinstance(call[2], str)]
+
+
+def run(service, store, **kwargs):
+    return process_comments_and_sentiments(service, 'planilha', 'Aba', 'A', 'B', read_chunk_rows=2,
+                                           state_store=store, cache=PredictionCache(disk_path=None), **kwargs)
+
+
+def test_incremental_run_only_reads_rows_after_watermark(registry, tmp_path):
+    service = FakeSheetsService()
+    store = SheetsStateStore(str(tmp_path / 'estado.json'))
+    make_sheet(service, COMMENTS[:5])
+    assert run(service, store, incremental=True) == 5
+    assert store.load(store.key('planilha', 'Aba', 'A', 'B'))['watermark'] == 6
+
+    # Uma linha antiga sem sentimento fica de fora: está antes da marca d'água
+    service.sheets[('planilha', 'Aba')].pop((2, 1))
+    grid = service.sheets[('planilha', 'Aba')]
+    for row, comment in enumerate(COMMENTS[5:], start=7):
+        grid[(row, 0)] = comment
+    service.row_counts[('planilha', 'Aba')] = 6 + len(COMMENTS[5:])
+    service.calls.clear()
+
+    assert run(service, store, incremental=True) == len(COMMENTS[5:])
+    assert all(int(name.split('!A')[1].split(':')[0]) >= 7 for name in read_ranges(service))
+    sentiments = service.column_values('planilha', 'Aba', 'B')
+    assert sentiments[1] == ''
+    assert all(sentiments[6:])
+    assert store.load(store.key('planilha', 'Aba', 'A', 'B'))['watermark'] == 6 + len(COMMENTS[5:])
+
+
+def test_interrupted_run_resumes_from_checkpoint(registry, tmp_path):
+    service = FakeSheetsService()
+    store = SheetsStateStore(str(tmp_path / 'estado.json'))
+    make_sheet(service, COMMENTS[:6])
+
+    # Depois do primeiro bloco a próxima chamada à API falha
+    def fail_after_first_block(rows_read, row_count, updated):
+        if rows_read == 3:
+            service.fail_next(503)
+
+    with pytest.raises(FakeHttpError):
+        run(service, store, progress=fail_after_first_block)
+    key = store.key('planilha', 'Aba', 'A', 'B')
+    assert store.load(key)['checkpoint'] == 4
+    sentiments = service.column_values('planilha', 'Aba', 'B')
+    assert all(sentiments[1:3])
+    assert sentiments[3:] == [''] * 4
+
+    service.calls.clear()
+    assert run(service, store) == 4
+    assert read_ranges(service)[0] == 'Aba!A4:B5'
+    assert all(service.column_values('planilha', 'Aba', 'B')[1:])
+    assert store.load(key)['checkpoint'] is None
+
+
+def test_blank_rows_do_not_stall_watermark(registry, tmp_path):
+    service = FakeSheetsService()
+    store = SheetsStateStore(str(tmp_path / 'estado.json'))
+    # Linha 4 em branco e grade com linhas vazias no final, como em uma planilha comum
+    service.add_sheet('planilha', 'Aba', [['Comentário', 'Sentimento'], [COMMENTS[0]], [COMMENTS[1]], [],
+                                          [COMMENTS[2]], [COMMENTS[3]]], row_count=12)
+    run(service, store, incremental=True)
+    assert store.load(store.key('planilha', 'Aba', 'A', 'B'))['watermark'] == 6
+
+    service.sheets[('planilha', 'Aba')][(7, 0)] = COMMENTS[4]
+    service.calls.clear()
+    assert run(service, store, incremental=True) == 1
+    assert read_ranges(service)[0] == 'Aba!A7:B8'
+
+
+def test_full_run_ignores_checkpoint_left_by_incremental_run(registry, tmp_path):
+    service = FakeSheetsService()
+    store = SheetsStateStore(str(tmp_path / 'estado.json'))
+    make_sheet(service, COMMENTS[:6])
+    key = store.key('planilha', 'Aba', 'A', 'B')
+    store.save(key, {'watermark': 3, 'checkpoint': 4, 'checkpoint_mode': 'incremental'})
+
+    assert run(service, store) == 6
+    assert read_ranges(service)[0] == 'Aba!A2:B3'
+
+    store.save(key, {'watermark': 3, 'checkpoint': 6, 'checkpoint_mode': 'completo'})
+    service.calls.clear()
+    run(service, store, restart=True)
+    assert read_ranges(service)[0] == 'Aba!A2:B3'
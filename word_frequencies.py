@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+
+from stopwords import NOT_WORDS
+
+# Conjunto (busca O(1)) com as palavras ignoradas
+STOPWORDS = frozenset(NOT_WORDS)
+
+SENTIMENTS = ['Positivo', 'Negativo', 'Neutro']
+
+# Mesma expressão que o WordCloud.process_text usa para separar as palavras (min_word_length padrão)
+WORDCLOUD_PATTERN = re.compile(r"\w[\w']*")
+
+
+# Frequência das palavras relevantes de cada sentimento: {sentimento: Counter}.
+# Os comentários são agrupados por sentimento e cada grupo é tokenizado uma única vez
+# (lower + split sobre o texto do grupo inteiro); as palavras ignoradas são removidas das
+# contagens no final, em vez de testadas palavra a palavra.
+# Se tables for informado, as contagens são somadas a ele (usado na leitura em blocos).
+def count_words(comments, sentiments, tables=None):
+    if tables is None:
+        tables = {}
+
+    groups = {}
+    for comment, sentiment in zip(comments, sentiments):
+        # Ignora comentários vazios (NaN/None), como o dropna() fazia
+        if comment is None or comment != comment:
+            continue
+        groups.setdefault(sentiment, []).append(str(comment))
+
+    for sentiment, group in groups.items():
+        counts = Counter(' '.join(group).lower().split())
+        for word in STOPWORDS.intersection(counts):
+            del counts[word]
+        if sentiment in tables:
+            tables[sentiment].update(counts)
+        else:
+            tables[sentiment] = counts
+    return tables
+
+
+# Quantidade de palavras de cada sentimento no diagrama de Sankey: proporcional à
+# participação do sentimento no total, com no mínimo 2 palavras.
+# sentiment_counts pode ser um Counter ou o resultado de value_counts() do pandas.
+def sankey_word_limits(sentiment_counts):
+    total = sum(dict(sentiment_counts).values())
+    return {
+        sentiment: int(round(sentiment_counts.get(sentiment, 0) / total, 1) * 10) + 2 if total else 2
+        for sentiment in SENTIMENTS
+    }
+
+
+# Frequências para a nuvem de palavras com as regras do WordCloud.process_text(collocations=False):
+# mesma expressão para as palavras, sem o "'s" final, sem números, sem as stopwords do wordcloud e com
+# os plurais ("entregas") somados ao singular ("entrega") quando os dois aparecem. Só as palavras
+# distintas de counts são processadas, ponderadas pelas contagens. Diferenças em relação ao generate()
+# sobre o texto: as palavras ignoradas também saem quando vinham grudadas à pontuação ("não,"), e os
+# bigramas (collocations) não entram, pois dependem da ordem das palavras, que as contagens não guardam.
+def wordcloud_frequencies(counts):
+    from wordcloud import STOPWORDS as WORDCLOUD_STOPWORDS
+    from wordcloud.tokenization import process_tokens
+
+    words = Counter()
+    for token, count in counts.items():
+        for word in WORDCLOUD_PATTERN.findall(token):
+            lower = word.lower()
+            if lower.endswith("'s"):
+                word, lower = word[:-2], lower[:-2]
+            if word.isdigit() or word in STOPWORDS or lower in WORDCLOUD_STOPWORDS:
+                continue
+            words[word] += count
+
+    # process_tokens recebe cada palavra distinta uma vez; dele só interessa a forma padrão de cada
+    # uma (caixa mais comum e plural -> singular), aplicada depois às contagens
+    _, standard_forms = process_tokens(words)
+    frequencies = Counter()
+    for word, count in words.items():
+        frequencies[standard_forms[word.lower()]] += count
+    return frequencies
+
+
+# Palavras mais frequentes de cada sentimento para o diagrama de Sankey: {sentimento: [(palavra, n), ...]}
+def sankey_top_words(tables, sentiment_counts):
+    limits = sankey_word_limits(sentiment_counts)
+    return {sentiment: tables.get(sentiment, Counter()).most_common(limits[sentiment]) for sentiment in SENTIMENTS}